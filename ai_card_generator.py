@@ -1,11 +1,41 @@
 # Reference: python_gemini_ai_integrations blueprint
+import io
 import os
+import re
+import base64
+import hashlib
 import json
-from typing import List, Dict, Any
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception
+import logging
+import time
+import queue
+import atexit
+import contextlib
+import asyncio
+import weakref
+import threading
+import traceback
+from collections import deque
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Optional
+import requests
+from PIL import Image
+from pydantic import BaseModel, ValidationError
+from tenacity import RetryCallState, retry, stop_after_attempt, wait_random_exponential, retry_if_exception
 from google import genai
-from google.genai import types
+from google.genai import errors, types
+from card_schema import CardSpec
+from response_cache import get_response_cache, make_cache_key
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Full prompts and responses are only logged at DEBUG level; status lines are printed
+logger = logging.getLogger(__name__)
 
 
 AI_INTEGRATIONS_GEMINI_API_KEY = os.environ.get("AI_INTEGRATIONS_GEMINI_API_KEY")
@@ -20,6 +50,120 @@ client = genai.Client(
     }
 )
 
+# Async Gemini clients, one per event loop. The SDK's async HTTP connection pool is bound
+# to the loop it was first used on, and every asyncio.run starts a new loop.
+_loop_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, genai.Client]" = weakref.WeakKeyDictionary()
+
+
+def get_loop_client() -> genai.Client:
+    """
+    Get the Gemini client for async calls on the running event loop.
+    
+    All concurrent calls on one loop share a single client and its keep-alive
+    connections; the module-level client is used for synchronous calls.
+    """
+    loop = asyncio.get_running_loop()
+    loop_client = _loop_clients.get(loop)
+    if loop_client is None:
+        loop_client = genai.Client(
+            api_key=AI_INTEGRATIONS_GEMINI_API_KEY,
+            http_options={
+                'api_version': '',
+                'base_url': AI_INTEGRATIONS_GEMINI_BASE_URL
+            }
+        )
+        _loop_clients[loop] = loop_client
+    return loop_client
+
+# Sample top 10 images for performance (<30s target)
+MAX_ANALYZED_IMAGES = 10
+
+# Hex color codes in briefs and card designs
+HEX_COLOR_PATTERN = re.compile(r'#[0-9A-Fa-f]{6}')
+
+# "Couple:" and "Date:" lines of the brief's CARD TEXT section (tolerating list and bold markup)
+BRIEF_COUPLE_PATTERN = re.compile(r'^[\s*-]*Couple:[\s*]*(.+?)[\s*]*$', re.MULTILINE | re.IGNORECASE)
+BRIEF_DATE_PATTERN = re.compile(r'^[\s*-]*Date:[\s*]*(.+?)[\s*]*$', re.MULTILINE | re.IGNORECASE)
+
+# Size segment of Pinterest CDN URLs (e.g. /236x/, /736x/, /originals/)
+PINTEREST_SIZE_SEGMENT_PATTERN = re.compile(r'(pinimg\.com/)[^/]+/')
+
+# Bounds for the adaptive number of image analyses in flight at once
+MIN_CONCURRENT_IMAGE_ANALYSES = 1
+MAX_CONCURRENT_IMAGE_ANALYSES = 8
+INITIAL_CONCURRENT_IMAGE_ANALYSES = 5
+
+# Request rate for image analysis calls (gemini-2.5-flash paid tier allows ~1000 RPM; the
+# free tier only 15 RPM, i.e. 0.25/s). Bursts of up to one full board are let through.
+IMAGE_ANALYSIS_REQUESTS_PER_SECOND = 10.0
+IMAGE_ANALYSIS_BURST = MAX_ANALYZED_IMAGES
+
+# Worker threads for blocking work (image downloads, cache setup) shared by all requests.
+# asyncio.to_thread would use the default executor of each asyncio.run loop, which is
+# created and torn down with every pipeline stage.
+_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_IMAGE_ANALYSES, thread_name_prefix="gemini")
+atexit.register(_EXECUTOR.shutdown)
+
+# Threads for whole pipeline stages running in the background (e.g. image generation
+# overlapping the card design). Kept apart from _EXECUTOR, which those stages use
+# themselves, so they can never wait on a pool they occupy.
+_PIPELINE_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="pipeline")
+atexit.register(_PIPELINE_EXECUTOR.shutdown)
+
+# Seconds to wait for the first image generation before hedging with a second request
+IMAGE_GENERATION_HEDGE_AFTER_SECONDS = 20
+
+# Download and resize limits for analyzed images
+MAX_IMAGE_DOWNLOAD_BYTES = 20_000_000
+IMAGE_DOWNSCALE_BYTES = 2_000_000
+IMAGE_DOWNSCALE_DIMENSION = 1600
+IMAGE_ANALYSIS_DIMENSION = 1280
+
+# Keep-alive connection pool for image downloads - board images come from a handful of
+# CDN hosts (mostly i.pinimg.com), so concurrent downloads reuse TCP/TLS connections
+_SESSION = requests.Session()
+_SESSION.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0))
+_SESSION.headers['User-Agent'] = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+# Flex service tier: discounted tokens for calls the user already waits on behind a progress bar.
+# google-genai has no typed service_tier field yet, so it is merged into the request body.
+FLEX_TIER_HTTP_OPTIONS = types.HttpOptions(extra_body={"service_tier": "flex"})
+
+# Priority service tier for the final card design step the user waits on after the progress bar.
+# Priority requests downgrade to the standard tier when priority quota runs out instead of failing.
+PRIORITY_TIER_HTTP_OPTIONS = types.HttpOptions(extra_body={"service_tier": "priority"})
+
+
+def _debug_dump(title: str, text: str) -> None:
+    """Log a large prompt or response block, only if DEBUG logging is enabled"""
+    if logger.isEnabledFor(logging.DEBUG):
+        separator = "=" * 80
+        logger.debug("\n%s\n%s\n%s\n%s\n%s\n", separator, title, separator, text, separator)
+
+
+def _json_dumps(obj: Any, indent: bool = False) -> str:
+    """Serialize to JSON with orjson when it is installed, else the stdlib"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode("utf-8")
+    return json.dumps(obj, indent=2 if indent else None)
+
+
+def _json_loads(data: str) -> Any:
+    """Parse JSON with orjson when it is installed, else the stdlib"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class EmptyResponseError(Exception):
+    """Raised when Gemini returns no text. Never retried - only rate limits are."""
+    pass
+
+
+class MalformedCardJsonError(Exception):
+    """Raised when the streamed card design is not valid JSON or not a valid card. Retried."""
+    pass
+
 
 def is_rate_limit_error(exception: BaseException) -> bool:
     """Check if the exception is a rate limit or quota violation error."""
@@ -33,57 +177,383 @@ def is_rate_limit_error(exception: BaseException) -> bool:
     )
 
 
-@retry(
-    stop=stop_after_attempt(7),
-    wait=wait_exponential(multiplier=1, min=2, max=128),
-    retry=retry_if_exception(is_rate_limit_error),
-    reraise=True
-)
-def analyze_single_image(image_url: str) -> str:
+def get_retry_after_seconds(exception: BaseException) -> Optional[float]:
     """
-    Step 2a: Image-to-Description (The "Eyes")
-    Analyze a single image and extract detailed description including colors, mood, style, and typography.
+    Extract the server-suggested retry delay from a rate limit error, if any.
     
-    Downloads the image and sends it as base64 data to bypass Pinterest's robots.txt restrictions.
+    Checks the google.rpc.RetryInfo entry in the Gemini error details first, then
+    the HTTP Retry-After header of the underlying response.
+    """
+    details = getattr(exception, 'details', None)
+    error_info = details.get('error') if isinstance(details, dict) else None
+    if isinstance(error_info, dict):
+        for detail in error_info.get('details') or []:
+            if isinstance(detail, dict) and str(detail.get('@type', '')).endswith('google.rpc.RetryInfo'):
+                # Protobuf duration format, e.g. "35s" or "1.5s"
+                try:
+                    return float(str(detail.get('retryDelay', '')).rstrip('s'))
+                except ValueError:
+                    pass
+    
+    headers = getattr(getattr(exception, 'response', None), 'headers', None)
+    retry_after = headers.get('Retry-After') if headers else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    
+    return None
+
+
+def wait_for_rate_limit(max_wait: float):
+    """
+    Build a tenacity wait strategy for rate limit retries.
+    
+    Uses exponential backoff with full jitter so concurrent calls that hit a 429 at
+    the same moment don't retry in lockstep, but never waits less than the delay the
+    server asked for.
     
     Args:
-        image_url: URL of the image to analyze
+        max_wait: Upper bound for the jittered backoff in seconds
+    """
+    jittered_backoff = wait_random_exponential(multiplier=1, max=max_wait)
+    
+    def wait(retry_state: RetryCallState) -> float:
+        delay = jittered_backoff(retry_state)
+        if retry_state.outcome is not None and retry_state.outcome.failed:
+            retry_after = get_retry_after_seconds(retry_state.outcome.exception())
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+        return delay
+    
+    return wait
+
+
+def _run_blocking(func, *args):
+    """Run a blocking function on the shared executor from async code"""
+    return asyncio.get_running_loop().run_in_executor(_EXECUTOR, func, *args)
+
+
+# Explicit context cache names keyed by (model, system instruction); None means caching is unavailable
+_context_caches: Dict[tuple, Optional[str]] = {}
+_context_caches_lock = threading.Lock()
+
+# Context cache lifetime per model. The gemini-2.5-pro card design prompt is the most
+# expensive to resend, so its cache is kept for a day instead of being recreated hourly.
+DEFAULT_CONTEXT_CACHE_TTL = "3600s"
+CONTEXT_CACHE_TTLS = {
+    "gemini-2.5-pro": "86400s",
+}
+
+
+def _get_context_cache(model: str, system_instruction: str, refresh: bool = False) -> Optional[str]:
+    """
+    Get the name of an explicit Gemini context cache holding a static system instruction.
+    
+    The cache is created lazily on first use and shared by all threads. If the cache
+    cannot be created (e.g. the prompt is below the model's minimum cacheable size or
+    the endpoint doesn't support caching), None is returned and remembered so callers
+    fall back to sending the instruction inline.
+    
+    Args:
+        model: Model the cache is created for (caches are model-specific)
+        system_instruction: Static prompt prefix to cache
+        refresh: Recreate the cache even if one is already known (e.g. after it expired)
     
     Returns:
-        Detailed description of the image
+        Cache name, or None if context caching is unavailable
+    """
+    key = (model, system_instruction)
+    with _context_caches_lock:
+        if not refresh and key in _context_caches:
+            return _context_caches[key]
+        
+        try:
+            cache = client.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=system_instruction,
+                    ttl=CONTEXT_CACHE_TTLS.get(model, DEFAULT_CONTEXT_CACHE_TTL)
+                )
+            )
+            cache_name = cache.name
+            print(f"[CACHE] Created context cache {cache_name} for {model}")
+        except Exception as e:
+            cache_name = None
+            print(f"[CACHE] Context caching unavailable for {model}, sending prompt inline: {str(e)}")
+        
+        _context_caches[key] = cache_name
+        return cache_name
+
+
+def _generate_with_cached_instruction(
+    gen_client: genai.Client,
+    model: str,
+    system_instruction: str,
+    contents: Any,
+    config: Optional[types.GenerateContentConfig] = None
+) -> types.GenerateContentResponse:
+    """
+    Call generate_content with a static system instruction served from a context cache.
     
-    Raises:
-        Exception: If analysis fails after retries
+    Recreates the cache once if it has expired, and sends the instruction inline if
+    caching is unavailable.
     """
-    print("[DEBUG v2.0] analyze_single_image called - using types.Part(inline_data=types.Blob()) API")
-    import requests
+    config = config or types.GenerateContentConfig()
     
-    # Create a fresh Gemini client per request for thread safety
-    thread_client = genai.Client(
-        api_key=AI_INTEGRATIONS_GEMINI_API_KEY,
-        http_options={
-            'api_version': '',
-            'base_url': AI_INTEGRATIONS_GEMINI_BASE_URL   
-        }
+    cache_name = _get_context_cache(model, system_instruction)
+    for attempt in range(2):
+        if not cache_name:
+            break
+        try:
+            return gen_client.models.generate_content(
+                model=model,
+                contents=contents,
+                config=config.model_copy(update={"cached_content": cache_name})
+            )
+        except errors.ClientError as e:
+            # Expired/deleted caches are reported as NOT_FOUND or PERMISSION_DENIED
+            if e.code not in (403, 404) or attempt > 0:
+                raise
+            cache_name = _get_context_cache(model, system_instruction, refresh=True)
+    
+    return gen_client.models.generate_content(
+        model=model,
+        contents=contents,
+        config=config.model_copy(update={"system_instruction": system_instruction})
+    )
+
+
+async def _agenerate_with_cached_instruction(
+    gen_client: genai.Client,
+    model: str,
+    system_instruction: str,
+    contents: Any,
+    config: Optional[types.GenerateContentConfig] = None
+) -> types.GenerateContentResponse:
+    """Async variant of _generate_with_cached_instruction using the client's aio API."""
+    config = config or types.GenerateContentConfig()
+    
+    cache_name = await _run_blocking(_get_context_cache, model, system_instruction)
+    for attempt in range(2):
+        if not cache_name:
+            break
+        try:
+            return await gen_client.aio.models.generate_content(
+                model=model,
+                contents=contents,
+                config=config.model_copy(update={"cached_content": cache_name})
+            )
+        except errors.ClientError as e:
+            # Expired/deleted caches are reported as NOT_FOUND or PERMISSION_DENIED
+            if e.code not in (403, 404) or attempt > 0:
+                raise
+            cache_name = await _run_blocking(_get_context_cache, model, system_instruction, True)
+    
+    return await gen_client.aio.models.generate_content(
+        model=model,
+        contents=contents,
+        config=config.model_copy(update={"system_instruction": system_instruction})
+    )
+
+
+def _stream_with_cached_instruction(
+    gen_client: genai.Client,
+    model: str,
+    system_instruction: str,
+    contents: Any,
+    config: Optional[types.GenerateContentConfig] = None
+) -> Iterator[types.GenerateContentResponse]:
+    """Streaming variant of _generate_with_cached_instruction yielding response chunks."""
+    config = config or types.GenerateContentConfig()
+    
+    cache_name = _get_context_cache(model, system_instruction)
+    for attempt in range(2):
+        if not cache_name:
+            break
+        stream = gen_client.models.generate_content_stream(
+            model=model,
+            contents=contents,
+            config=config.model_copy(update={"cached_content": cache_name})
+        )
+        try:
+            # Cache errors surface on the first chunk, before anything has been yielded
+            first_chunk = next(stream, None)
+        except errors.ClientError as e:
+            # Expired/deleted caches are reported as NOT_FOUND or PERMISSION_DENIED
+            if e.code not in (403, 404) or attempt > 0:
+                raise
+            cache_name = _get_context_cache(model, system_instruction, refresh=True)
+            continue
+        
+        if first_chunk is not None:
+            yield first_chunk
+        yield from stream
+        return
+    
+    yield from gen_client.models.generate_content_stream(
+        model=model,
+        contents=contents,
+        config=config.model_copy(update={"system_instruction": system_instruction})
     )
+
+
+class AdaptiveConcurrencyController:
+    """
+    AIMD controller for the number of concurrent Gemini calls.
     
-    # Download the image (bypasses Pinterest robots.txt blocking of Gemini)
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-    }
-    response = requests.get(image_url, headers=headers, timeout=10)
-    response.raise_for_status()
+    Each success adds one permit (up to max_limit) unless the API rate-limited us within
+    the sliding window; each rate limit error halves the permits (down to min_limit).
+    The state is shared by all batches and threads, so what one run learns about the
+    current quota carries over to the next.
+    """
+    
+    def __init__(self, min_limit: int, max_limit: int, initial_limit: int, window_seconds: float = 60.0):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.window_seconds = window_seconds
+        self._limit = initial_limit
+        self._rate_limited_at: deque = deque()
+        self._lock = threading.Lock()
+    
+    @property
+    def limit(self) -> int:
+        return self._limit
+    
+    def _prune(self, now: float) -> None:
+        while self._rate_limited_at and now - self._rate_limited_at[0] > self.window_seconds:
+            self._rate_limited_at.popleft()
+    
+    def record_success(self) -> None:
+        """Additive increase, only once the window is free of rate limit errors"""
+        with self._lock:
+            self._prune(time.monotonic())
+            if not self._rate_limited_at:
+                self._limit = min(self.max_limit, self._limit + 1)
+    
+    def record_rate_limit(self) -> None:
+        """Multiplicative decrease on every rate limit error"""
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            self._rate_limited_at.append(now)
+            self._limit = max(self.min_limit, self._limit // 2)
+
+
+class _AdaptiveLimiter:
+    """
+    Async context manager admitting at most `controller.limit` concurrent tasks.
+    
+    Created per batch since asyncio primitives bind to the event loop they are used on;
+    the limit itself comes from the shared controller and is re-read on every admission.
+    """
+    
+    def __init__(self, controller: AdaptiveConcurrencyController):
+        self._controller = controller
+        self._in_flight = 0
+        self._condition = asyncio.Condition()
+    
+    async def __aenter__(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self._controller.limit)
+            self._in_flight += 1
+    
+    async def __aexit__(self, *exc_info) -> None:
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+
+image_analysis_concurrency = AdaptiveConcurrencyController(
+    min_limit=MIN_CONCURRENT_IMAGE_ANALYSES,
+    max_limit=MAX_CONCURRENT_IMAGE_ANALYSES,
+    initial_limit=INITIAL_CONCURRENT_IMAGE_ANALYSES
+)
+
+
+class TokenBucketRateLimiter:
+    """
+    Token bucket limiting how many requests are started per second.
     
-    # Determine MIME type from URL or content
-    mime_type = "image/jpeg"
-    if ".png" in image_url.lower():
-        mime_type = "image/png"
-    elif ".webp" in image_url.lower():
-        mime_type = "image/webp"
+    Complements the concurrency controller: that one caps requests in flight, this one
+    spaces out request starts so bursts don't trip the per-minute quota. Tokens are
+    reserved under a thread lock and waited for with asyncio.sleep, so one limiter can
+    be shared by every event loop and thread.
+    """
     
-    prompt = """You are an expert wedding design consultant analyzing a Pinterest inspiration image. Extract specific design elements:
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def reserve(self) -> float:
+        """Take a token and return how many seconds to wait before it may be used"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+    
+    async def acquire(self) -> None:
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
 
-COLORS (CRITICAL - Be Precise):
+
+image_analysis_rate_limiter = TokenBucketRateLimiter(
+    rate=IMAGE_ANALYSIS_REQUESTS_PER_SECOND,
+    capacity=IMAGE_ANALYSIS_BURST
+)
+
+class _ProgressReporter:
+    """
+    Delivers progress updates to a callback from a single consumer thread.
+    
+    Workers only enqueue updates on a lock-free SimpleQueue and never wait on UI work;
+    the consumer thread invokes the callback in order. When running under Streamlit,
+    the consumer thread is attached to the caller's script context so UI updates
+    from it are allowed.
+    """
+    
+    def __init__(self, callback=None):
+        self._callback = callback
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = None
+        
+        if callback:
+            self._thread = threading.Thread(target=self._drain, name="progress-callback", daemon=True)
+            try:
+                from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+                add_script_run_ctx(self._thread, get_script_run_ctx(suppress_warning=True))
+            except ImportError:
+                pass
+            self._thread.start()
+    
+    def report(self, message: str, current: int, total: int) -> None:
+        if self._thread:
+            self._queue.put((message, current, total))
+    
+    def close(self) -> None:
+        """Deliver all pending updates and stop the consumer thread"""
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+    
+    def _drain(self) -> None:
+        while (update := self._queue.get()) is not None:
+            try:
+                self._callback(*update)
+            except Exception:
+                # Never let a UI error (e.g. Streamlit NoSessionContext) fail the analysis
+                pass
+
+
+IMAGE_ANALYSIS_CRITERIA = """COLORS (CRITICAL - Be Precise):
 - Identify the 3-5 dominant colors in the image
 - For each color, provide the exact hex code (e.g., #F5E6D3, #8B7355, #2C5F2D)
 - Note if colors are warm/cool, muted/vibrant, pastel/saturated
@@ -103,29 +573,356 @@ LAYOUT & COMPOSITION:
 - Centered or offset arrangement
 
 Be extremely specific about colors - they are the most important element."""
+
+IMAGE_ANALYSIS_PROMPT = f"""You are an expert wedding design consultant analyzing a Pinterest inspiration image. Extract specific design elements:
+
+{IMAGE_ANALYSIS_CRITERIA}"""
+
+
+def _download_image(image_url: str) -> tuple[bytes, str]:
+    """
+    Download an image and determine its MIME type.
     
-    api_response = thread_client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=[
-            prompt,
-            types.Part(
-                inline_data=types.Blob(
-                    mime_type=mime_type,
-                    data=response.content
-                )
+    Images are downloaded locally (rather than passed to Gemini by URL) to bypass
+    Pinterest's robots.txt blocking of Gemini.
+    
+    Args:
+        image_url: URL of the image to download
+    
+    Returns:
+        Tuple of (image bytes, MIME type)
+    
+    Raises:
+        Exception: If the image is larger than MAX_IMAGE_DOWNLOAD_BYTES
+    """
+    # Stream the body so oversized files are abandoned without being read into memory
+    with _SESSION.get(image_url, timeout=10, stream=True) as response:
+        response.raise_for_status()
+        buffer = io.BytesIO()
+        for block in response.iter_content(chunk_size=64 * 1024):
+            buffer.write(block)
+            if buffer.tell() > MAX_IMAGE_DOWNLOAD_BYTES:
+                raise Exception(f"Image larger than {MAX_IMAGE_DOWNLOAD_BYTES} bytes: {image_url}")
+    image_bytes = buffer.getvalue()
+    
+    # CDN URLs often have no (or a misleading) extension - trust the content instead
+    return _shrink_image(image_bytes, _sniff_mime(image_bytes) or "image/jpeg")
+
+
+def _sniff_mime(data: bytes) -> Optional[str]:
+    """
+    Detect an image MIME type from its leading magic bytes.
+    
+    Args:
+        data: Image data (only the first 12 bytes are inspected)
+    
+    Returns:
+        MIME type, or None if the format isn't recognized
+    """
+    head = data[:12]
+    if head.startswith(b'\x89PNG'):
+        return "image/png"
+    if head.startswith(b'\xff\xd8\xff'):
+        return "image/jpeg"
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return "image/webp"
+    if head[:3] == b'GIF':
+        return "image/gif"
+    return None
+
+
+def _shrink_image(image_bytes: bytes, mime_type: str) -> tuple[bytes, str]:
+    """
+    Downscale large images before they are sent to Gemini.
+    
+    Gemini gains nothing from inputs much above ~1MP, so images over
+    IMAGE_DOWNSCALE_BYTES or IMAGE_DOWNSCALE_DIMENSION are re-encoded as JPEG of at
+    most IMAGE_ANALYSIS_DIMENSION pixels per side. Anything Pillow can't read is
+    returned unchanged.
+    
+    Args:
+        image_bytes: Downloaded image data
+        mime_type: MIME type of the downloaded image
+    
+    Returns:
+        Tuple of (image bytes, MIME type)
+    """
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            if len(image_bytes) <= IMAGE_DOWNSCALE_BYTES and max(img.size) <= IMAGE_DOWNSCALE_DIMENSION:
+                return image_bytes, mime_type
+            
+            img.thumbnail((IMAGE_ANALYSIS_DIMENSION, IMAGE_ANALYSIS_DIMENSION))
+            output = io.BytesIO()
+            img.convert("RGB").save(output, "JPEG", quality=85)
+    except Exception as e:
+        print(f"Could not downscale image, sending it unchanged: {type(e).__name__}: {str(e)}")
+        return image_bytes, mime_type
+    
+    return output.getvalue(), "image/jpeg"
+
+
+def _image_description_cache_key(image_url: str) -> str:
+    """Response cache key of an image description (shared by the sync and batch paths)"""
+    return make_cache_key("gemini-2.5-flash", IMAGE_ANALYSIS_PROMPT, image_url)
+
+
+def _image_content_cache_key(image_bytes: bytes) -> str:
+    """Response cache key of an image description by image content, independent of the URL"""
+    return make_cache_key("gemini-2.5-flash", IMAGE_ANALYSIS_PROMPT, hashlib.sha256(image_bytes).hexdigest())
+
+
+def _image_analysis_parts(image_bytes: bytes, mime_type: str) -> List[types.Part]:
+    """
+    Build the request contents of an image analysis (sent with IMAGE_ANALYSIS_PROMPT as
+    the system instruction). Shared by the sync and batch paths so both send the same request.
+    """
+    return [
+        types.Part(
+            inline_data=types.Blob(
+                mime_type=mime_type,
+                data=image_bytes
+            )
+        )
+    ]
+
+
+@retry(
+    stop=stop_after_attempt(7),
+    wait=wait_for_rate_limit(max_wait=128),
+    retry=retry_if_exception(is_rate_limit_error),
+    before_sleep=lambda retry_state: image_analysis_concurrency.record_rate_limit(),
+    reraise=True
+)
+async def _analyze_image_bytes(image_bytes: bytes, mime_type: str, limiter=None) -> str:
+    """
+    Describe an already downloaded image with Gemini.
+    
+    Args:
+        image_bytes: Image data
+        mime_type: MIME type of the image
+        limiter: Optional _AdaptiveLimiter held only for the Gemini call itself, so
+            retry backoff doesn't occupy a slot
+    
+    Returns:
+        Detailed description of the image
+    
+    Raises:
+        EmptyResponseError: If Gemini returns no description
+    """
+    async with limiter or contextlib.nullcontext():
+        # Every attempt (including tenacity retries) takes a token
+        await image_analysis_rate_limiter.acquire()
+        api_response = await _agenerate_with_cached_instruction(
+            get_loop_client(),
+            model="gemini-2.5-flash",
+            system_instruction=IMAGE_ANALYSIS_PROMPT,
+            contents=_image_analysis_parts(image_bytes, mime_type),
+            config=types.GenerateContentConfig(
+                http_options=FLEX_TIER_HTTP_OPTIONS
             )
-        ]
+        )
+    
+    description = api_response.text
+    if not description:
+        raise EmptyResponseError("Empty image description")
+    return description
+
+
+async def analyze_single_image(image_url: str, limiter=None) -> str:
+    """
+    Step 2a: Image-to-Description (The "Eyes")
+    Analyze a single image and extract detailed description including colors, mood, style, and typography.
+    
+    Downloads the image and sends it as base64 data to bypass Pinterest's robots.txt restrictions.
+    The download is not limited by the Gemini concurrency limiter, so images keep
+    downloading while earlier ones are being analyzed.
+    
+    Args:
+        image_url: URL of the image to analyze
+        limiter: Optional _AdaptiveLimiter bounding concurrent Gemini calls
+    
+    Returns:
+        Detailed description of the image
+    
+    Raises:
+        EmptyResponseError: If Gemini returns no description
+        Exception: If analysis fails after retries
+    """
+    # Popular pins recur across boards and users - reuse previous descriptions
+    cache_key = _image_description_cache_key(image_url)
+    cached_description = get_response_cache().get("image_description", cache_key)
+    if cached_description:
+        return cached_description
+    
+    # Download in a worker thread so concurrent analyses don't block the event loop
+    image_bytes, mime_type = await _run_blocking(_download_image, image_url)
+    
+    # The same picture is often pinned under different URLs - match on the image bytes too
+    content_cache_key = _image_content_cache_key(image_bytes)
+    cached_description = get_response_cache().get("image_description", content_cache_key)
+    if cached_description:
+        get_response_cache().set("image_description", cache_key, cached_description)
+        return cached_description
+    
+    description = await _analyze_image_bytes(image_bytes, mime_type, limiter)
+    get_response_cache().set("image_description", cache_key, description)
+    get_response_cache().set("image_description", content_cache_key, description)
+    return description
+
+
+def sample_image_urls(image_urls: List[str]) -> List[str]:
+    """
+    Pick up to MAX_ANALYZED_IMAGES unique images, keeping board order.
+    
+    Duplicate pins and the same Pinterest image at different scales (e.g. /236x/ and
+    /736x/ variants of one file) count as one image, so no slot is spent on analyzing
+    the same picture twice.
+    
+    Args:
+        image_urls: Image URLs in board order
+    
+    Returns:
+        Unique image URLs to analyze
+    """
+    unique_urls: Dict[str, str] = {}
+    for url in image_urls:
+        image_key = PINTEREST_SIZE_SEGMENT_PATTERN.sub(r'\1', url)
+        unique_urls.setdefault(image_key, url)
+        if len(unique_urls) >= MAX_ANALYZED_IMAGES:
+            break
+    return list(unique_urls.values())
+
+
+# Batch job states after which polling stops
+_BATCH_TERMINAL_STATES = {
+    "JOB_STATE_SUCCEEDED",
+    "JOB_STATE_PARTIALLY_SUCCEEDED",
+    "JOB_STATE_FAILED",
+    "JOB_STATE_CANCELLED",
+    "JOB_STATE_EXPIRED",
+}
+
+
+def _analyze_images_via_batch_api(image_urls: List[str], progress_callback=None) -> List[str]:
+    """
+    Analyze images with a single Gemini Batch API job instead of one synchronous call per image.
+    
+    All images are packed into one JSONL file (one request per image, keyed by index),
+    uploaded once and submitted as a single batch job. Batch jobs are billed at a discount
+    and have their own rate limits, but can take minutes to complete, so this path is
+    only meant for flows that are not latency-sensitive.
+    
+    Args:
+        image_urls: List of image URLs to analyze
+        progress_callback: Optional callback function for progress updates
+    
+    Returns:
+        List of image descriptions (empty string for images that failed)
+    
+    Raises:
+        Exception: If the batch job fails or too many images fail analysis
+    """
+    # Images described before (by either path) don't need to be part of the job
+    descriptions: List[str] = [""] * len(image_urls)
+    for i, url in enumerate(image_urls):
+        descriptions[i] = get_response_cache().get("image_description", _image_description_cache_key(url)) or ""
+    
+    # Build the JSONL request file in memory (images are inlined since Gemini can't fetch Pinterest URLs)
+    system_instruction = types.Content(parts=[types.Part(text=IMAGE_ANALYSIS_PROMPT)]).model_dump(mode="json", exclude_none=True)
+    request_lines = []
+    content_cache_keys: Dict[int, str] = {}
+    download_failures = 0
+    for i, url in enumerate(image_urls):
+        if descriptions[i]:
+            continue
+        try:
+            image_bytes, mime_type = _download_image(url)
+        except Exception as e:
+            print(f"Failed to download image {url}: {type(e).__name__}: {str(e)}")
+            download_failures += 1
+            continue
+        
+        content_cache_keys[i] = _image_content_cache_key(image_bytes)
+        descriptions[i] = get_response_cache().get("image_description", content_cache_keys[i]) or ""
+        if descriptions[i]:
+            get_response_cache().set("image_description", _image_description_cache_key(url), descriptions[i])
+            continue
+        
+        contents = types.Content(role="user", parts=_image_analysis_parts(image_bytes, mime_type))
+        request_lines.append(json.dumps({
+            "key": f"img_{i}",
+            "request": {
+                "contents": [contents.model_dump(mode="json", exclude_none=True)],
+                "system_instruction": system_instruction
+            }
+        }))
+    
+    if download_failures > len(image_urls) // 2:
+        raise Exception(f"Too many image download failures ({download_failures}/{len(image_urls)})")
+    
+    if not request_lines:
+        print("[CACHE] All batch image descriptions served from cache")
+        return descriptions
+    
+    uploaded = client.files.upload(
+        file=io.BytesIO("\n".join(request_lines).encode("utf-8")),
+        config=types.UploadFileConfig(display_name="wedding-card-image-analysis", mime_type="jsonl")
+    )
+    
+    batch_job = client.batches.create(
+        model="gemini-2.5-flash",
+        src={"file_name": uploaded.name},
+        config=types.CreateBatchJobConfig(display_name="wedding-card-image-analysis")
     )
-    return api_response.text or ""
+    print(f"[BATCH] Submitted batch job {batch_job.name} with {len(request_lines)} image(s)")
+    
+    # Poll with exponential sleep until the job reaches a terminal state
+    delay = 5
+    while batch_job.state is None or batch_job.state.name not in _BATCH_TERMINAL_STATES:
+        if progress_callback:
+            progress_callback("Waiting for batch image analysis...", 20, 100)
+        time.sleep(delay)
+        delay = min(delay * 2, 60)
+        batch_job = client.batches.get(name=batch_job.name)
+    
+    if batch_job.state.name not in ("JOB_STATE_SUCCEEDED", "JOB_STATE_PARTIALLY_SUCCEEDED"):
+        raise Exception(f"Batch image analysis job {batch_job.name} ended in state {batch_job.state.name}: {batch_job.error}")
+    
+    # Map results back to their original positions by key
+    result_file = client.files.download(file=batch_job.dest.file_name)
+    for line in result_file.decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        idx = int(item["key"].removeprefix("img_"))
+        if "response" in item:
+            descriptions[idx] = types.GenerateContentResponse.model_validate(item["response"]).text or ""
+            if descriptions[idx]:
+                get_response_cache().set("image_description", _image_description_cache_key(image_urls[idx]), descriptions[idx])
+                get_response_cache().set("image_description", content_cache_keys[idx], descriptions[idx])
+        else:
+            print(f"Failed to analyze image {image_urls[idx]} in batch: {item.get('error')}")
+    
+    failed_count = sum(1 for desc in descriptions if not desc)
+    if failed_count > len(image_urls) // 2:
+        raise Exception(f"Too many image analysis failures ({failed_count}/{len(image_urls)})")
+    
+    if progress_callback:
+        progress_callback(f"Analyzed {len(image_urls)} images", 40, 100)
+    
+    return descriptions
 
 
-def analyze_images_batch(image_urls: List[str], progress_callback=None) -> List[str]:
+async def analyze_images_batch(image_urls: List[str], progress_callback=None, use_batch: bool = False) -> List[str]:
     """
     Analyze multiple images concurrently with rate limiting and automatic retries.
     
     Args:
-        image_urls: List of image URLs to analyze (will be sampled to top 10 for performance)
+        image_urls: List of image URLs to analyze (deduplicated and sampled to top 10 for performance)
         progress_callback: Optional callback function for progress updates
+        use_batch: Submit all images as one Gemini Batch API job instead of concurrent
+            Gemini calls (cheaper, but not suitable for latency-sensitive flows)
     
     Returns:
         List of image descriptions
@@ -133,274 +930,364 @@ def analyze_images_batch(image_urls: List[str], progress_callback=None) -> List[
     Raises:
         Exception: If too many images fail analysis
     """
-    # Sample top 10 images for performance (<30s target)
-    sampled_urls = image_urls[:10]
+    sampled_urls = sample_image_urls(image_urls)
     
-    def process_image(i: int, url: str) -> tuple[int, str]:
+    if use_batch:
+        # The batch job is submitted and polled synchronously - keep it off the event loop,
+        # delivering its progress updates through the reporter's UI-attached thread
+        progress = _ProgressReporter(progress_callback)
         try:
-            description = analyze_single_image(url)
-            if progress_callback:
-                try:
-                    # Calculate progress as percentage (0-40 for image analysis phase)
-                    progress_pct = int((i + 1) / len(sampled_urls) * 40)
-                    progress_callback(f"Analyzing image {i + 1}/{len(sampled_urls)}...", progress_pct, 100)
-                except Exception:
-                    # Silently ignore Streamlit NoSessionContext errors from worker threads
-                    pass
-            return (i, description)
+            return await _run_blocking(_analyze_images_via_batch_api, sampled_urls, progress.report)
+        finally:
+            progress.close()
+    
+    # Bound in-flight Gemini calls (not downloads) by the adaptive (429-driven) concurrency limit
+    limiter = _AdaptiveLimiter(image_analysis_concurrency)
+    
+    # Progress updates are queued and delivered off the event loop
+    progress = _ProgressReporter(progress_callback)
+    
+    def report_progress(i: int) -> None:
+        # Calculate progress as percentage (0-40 for image analysis phase)
+        progress_pct = int((i + 1) / len(sampled_urls) * 40)
+        progress.report(f"Analyzing image {i + 1}/{len(sampled_urls)}...", progress_pct, 100)
+    
+    # Once more than half the images failed the batch is doomed - stop the remaining work
+    max_failures = len(sampled_urls) // 2
+    failures: List[BaseException] = []
+    tasks: List[asyncio.Task] = []
+    
+    async def process_image(i: int, url: str) -> str:
+        try:
+            description = await analyze_single_image(url, limiter)
+            image_analysis_concurrency.record_success()
+            report_progress(i)
+            return description
         except Exception as e:
-            import traceback
             error_details = f"Error analyzing image {url}: {type(e).__name__}: {str(e)}"
             print(error_details)
             print(f"Full traceback:\n{traceback.format_exc()}")
-            if progress_callback:
-                try:
-                    progress_pct = int((i + 1) / len(sampled_urls) * 40)
-                    progress_callback(f"Analyzing image {i + 1}/{len(sampled_urls)}...", progress_pct, 100)
-                except Exception:
-                    # Silently ignore Streamlit NoSessionContext errors from worker threads
-                    pass
+            
+            failures.append(e)
+            if len(failures) == max_failures + 1:
+                print(f"Aborting image analysis after {len(failures)} failures")
+                progress.report("Image analysis failed, stopping...", 40, 100)
+                for task in tasks:
+                    task.cancel()
+            else:
+                report_progress(i)
             raise
     
-    descriptions: List[str] = [""] * len(sampled_urls)
-    failed_count = 0
+    tasks.extend(asyncio.create_task(process_image(i, url)) for i, url in enumerate(sampled_urls))
+    try:
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        progress.close()
     
-    # Use ThreadPoolExecutor with max_workers=2 to limit concurrency
-    with ThreadPoolExecutor(max_workers=2) as executor:
-        futures = {executor.submit(process_image, i, url): i for i, url in enumerate(sampled_urls)}
-        for future in as_completed(futures):
-            try:
-                idx, result = future.result()
-                descriptions[idx] = result
-            except Exception as e:
-                failed_count += 1
-                print(f"Failed to analyze image after retries: {str(e)}")
-                if failed_count > len(sampled_urls) // 2:
-                    raise Exception(f"Too many image analysis failures ({failed_count}/{len(sampled_urls)})")
+    if len(failures) > max_failures:
+        raise Exception(f"Too many image analysis failures ({len(failures)}/{len(sampled_urls)})")
+    
+    descriptions: List[str] = [""] * len(sampled_urls)
+    for idx, result in enumerate(results):
+        if isinstance(result, BaseException):
+            print(f"Failed to analyze image after retries: {str(result)}")
+        else:
+            descriptions[idx] = result
     
     return descriptions
 
 
+# Required structure of the design brief (shared by the per-image and single-call pipelines)
+DESIGN_BRIEF_SECTIONS = """**CARD TEXT:**
+Suggest the invitation wording as exactly these two lines (invent plausible values):
+Couple: <the couple's first names, e.g. Anna & Markus>
+Date: <the wedding date, e.g. 14. Juni 2025>
+
+**AESTHETIC SUMMARY:**
+Write 2-3 sentences capturing the overall visual style, mood, and wedding vibe.
+
+**COLOR PALETTE (EXACTLY 5 HEX CODES):**
+List exactly 5 hex codes that appear most frequently across these images. Choose:
+- 1 background color (usually lightest/neutral: white, cream, blush, sage, etc.)
+- 2-3 primary accent colors (the dominant aesthetic colors)
+- 1-2 secondary/text colors (darker for readability)
+
+Format: #HEXCODE - description
+Example:
+- #FFFFFF - Clean white background
+- #D4AF37 - Warm gold accent
+- #8B7355 - Earthy brown
+- #F5E6D3 - Soft cream
+- #2C2C2C - Charcoal text
+
+**KEY MOTIFS (3-5 elements):**
+List specific visual elements that appear repeatedly:
+- florals, botanical, geometric, hearts, ribbons, watercolor, gold accents, etc.
+
+**TYPOGRAPHY STYLE:**
+Recommend 1-2 font combinations based on the aesthetic:
+- "Script" for romantic/elegant/flowing styles
+- "Serif" for classic/traditional/sophisticated styles
+- "Sans-Serif" for modern/minimal/clean styles
+
+Be extremely specific about colors - extract actual hex codes from the images."""
+
+# Synthesis prompt of the per-image pipeline: the static instructions go first (as the
+# system instruction) so every call shares the same prefix; only the descriptions vary
+DESIGN_BRIEF_SYSTEM_PROMPT = f"""You are a design director at a premium wedding stationery company. Analyze the Pinterest board descriptions you are given and create a precise design brief for a wedding invitation.
+
+Create a structured design brief with these EXACT sections:
+
+{DESIGN_BRIEF_SECTIONS}"""
+
+DESIGN_BRIEF_PROMPT_TEMPLATE = """IMAGE DESCRIPTIONS FROM PINTEREST BOARD:
+{combined_descriptions}"""
+
+# Single multimodal call: describe every image and synthesize the brief in one request
+BOARD_ANALYSIS_PROMPT = f"""You are a design director at a premium wedding stationery company. The attached images come from a couple's Pinterest wedding inspiration board.
+
+1. For EACH image, in the order given, write a detailed description covering these design elements:
+
+{IMAGE_ANALYSIS_CRITERIA}
+
+2. Then combine all images into a precise design brief for a wedding invitation. Create a structured design brief with these EXACT sections:
+
+{DESIGN_BRIEF_SECTIONS}
+
+Return "descriptions" (one entry per image, in the order given) and "design_brief" (the complete brief as markdown text with the sections above)."""
+
+
+# Font families the brief's TYPOGRAPHY STYLE section recommends from
+BRIEF_FONT_FAMILIES = ("Script", "Serif", "Sans-Serif")
+
+
+def is_brief_ready_for_speculation(partial_brief: str) -> bool:
+    """
+    Check whether a partially streamed brief already has everything the card design needs.
+    
+    The palette and typography sections are what drive the card design; once all five
+    hex codes and a font recommendation are present, the rest rarely changes the card.
+    """
+    _, _, typography = partial_brief.partition("TYPOGRAPHY STYLE")
+    has_palette = len(set(HEX_COLOR_PATTERN.findall(partial_brief))) >= 5
+    has_font = any(family in typography for family in BRIEF_FONT_FAMILIES)
+    return has_palette and has_font
+
+
+def brief_extends_partial(partial_brief: str, final_brief: str) -> bool:
+    """
+    Check whether the final brief only adds text to the partial brief that can't affect
+    the card design (no further colors or font recommendations).
+    """
+    if not final_brief.startswith(partial_brief):
+        return False
+    
+    tail = final_brief[len(partial_brief):]
+    if HEX_COLOR_PATTERN.search(tail):
+        return False
+    return not any(family in tail for family in BRIEF_FONT_FAMILIES)
+
+
+class BoardAnalysis(BaseModel):
+    """Structured response of the single-call board analysis"""
+    descriptions: List[str]
+    design_brief: str
+
+
 @retry(
     stop=stop_after_attempt(7),
-    wait=wait_exponential(multiplier=1, min=2, max=128),
+    wait=wait_for_rate_limit(max_wait=128),
     retry=retry_if_exception(is_rate_limit_error),
     reraise=True
 )
-def synthesize_design_brief(image_descriptions: List[str]) -> str:
+def synthesize_design_brief(
+    image_descriptions: List[str],
+    on_partial_brief=None,
+    use_cache: bool = True
+) -> str:
     """
     Step 2b: Description-to-Brief (The "Synthesizer")
     Synthesize multiple image descriptions into a cohesive design brief.
     
+    The brief is streamed. Once the streamed text contains the full palette and a
+    typography recommendation, it is passed to on_partial_brief (at most once) so the
+    card design can start speculatively while the rest of the brief is generated.
+    
     Args:
         image_descriptions: List of detailed image descriptions
+        on_partial_brief: Optional callback receiving the partial brief
+        use_cache: Reuse a cached brief for the same descriptions. Pass False to
+            generate a new brief (e.g. on "Try Again")
     
     Returns:
         A cohesive design brief for wedding invitation
-    """
-    combined_descriptions = "\n\n---\n\n".join([
-        f"Image {i+1}: {desc}" 
-        for i, desc in enumerate(image_descriptions) if desc
-    ])
-    
-    prompt = f"""You are a design director at a premium wedding stationery company. Analyze these Pinterest board descriptions and create a precise design brief for a wedding invitation.
-
-IMAGE DESCRIPTIONS FROM PINTEREST BOARD:
-{combined_descriptions}
-
-Create a structured design brief with these EXACT sections:
-
-**AESTHETIC SUMMARY:**
-Write 2-3 sentences capturing the overall visual style, mood, and wedding vibe.
-
-**COLOR PALETTE (EXACTLY 5 HEX CODES):**
-List exactly 5 hex codes that appear most frequently across these images. Choose:
-- 1 background color (usually lightest/neutral: white, cream, blush, sage, etc.)
-- 2-3 primary accent colors (the dominant aesthetic colors)
-- 1-2 secondary/text colors (darker for readability)
-
-Format: #HEXCODE - description
-Example:
-- #FFFFFF - Clean white background
-- #D4AF37 - Warm gold accent
-- #8B7355 - Earthy brown
-- #F5E6D3 - Soft cream
-- #2C2C2C - Charcoal text
-
-**KEY MOTIFS (3-5 elements):**
-List specific visual elements that appear repeatedly:
-- florals, botanical, geometric, hearts, ribbons, watercolor, gold accents, etc.
-
-**TYPOGRAPHY STYLE:**
-Recommend 1-2 font combinations based on the aesthetic:
-- "Script" for romantic/elegant/flowing styles
-- "Serif" for classic/traditional/sophisticated styles
-- "Sans-Serif" for modern/minimal/clean styles
-
-Be extremely specific about colors - extract actual hex codes from the images."""
     
-    response = client.models.generate_content(
+    Raises:
+        EmptyResponseError: If Gemini returns no brief
+    """
+    # Identical boards produce identical descriptions - reuse the previous brief (order-insensitive)
+    cache_key = make_cache_key(
+        "gemini-2.5-flash",
+        DESIGN_BRIEF_SYSTEM_PROMPT,
+        DESIGN_BRIEF_PROMPT_TEMPLATE,
+        *sorted(desc for desc in image_descriptions if desc)
+    )
+    if use_cache:
+        cached_brief = get_response_cache().get("design_brief", cache_key)
+        if cached_brief:
+            print("[CACHE] Reusing cached design brief")
+            return cached_brief
+    
+    # Stream the descriptions into one buffer instead of building a list of copies to join
+    buffer = io.StringIO()
+    for i, desc in enumerate(image_descriptions):
+        if desc:
+            if buffer.tell():
+                buffer.write("\n\n---\n\n")
+            buffer.write(f"Image {i+1}: {desc}")
+    combined_descriptions = buffer.getvalue()
+    
+    prompt = DESIGN_BRIEF_PROMPT_TEMPLATE.format(combined_descriptions=combined_descriptions)
+    
+    stream = _stream_with_cached_instruction(
+        client,
         model="gemini-2.5-flash",
-        contents=prompt
+        system_instruction=DESIGN_BRIEF_SYSTEM_PROMPT,
+        contents=prompt,
+        config=types.GenerateContentConfig(
+            http_options=FLEX_TIER_HTTP_OPTIONS
+        )
     )
     
-    design_brief = response.text or ""
-    print("\n" + "="*80)
-    print("DESIGN BRIEF GENERATED:")
-    print("="*80)
-    print(design_brief)
-    print("="*80 + "\n")
+    design_brief = ""
+    speculation_started = on_partial_brief is None
+    for chunk in stream:
+        design_brief += chunk.text or ""
+        if not speculation_started and is_brief_ready_for_speculation(design_brief):
+            speculation_started = True
+            on_partial_brief(design_brief)
+    
+    print(f"Design brief generated ({len(design_brief)} chars)")
+    _debug_dump("DESIGN BRIEF GENERATED:", design_brief)
+    
+    if not design_brief:
+        raise EmptyResponseError("Empty design brief")
+    get_response_cache().set("design_brief", cache_key, design_brief)
     
     return design_brief
 
 
 @retry(
     stop=stop_after_attempt(7),
-    wait=wait_exponential(multiplier=1, min=2, max=128),
+    wait=wait_for_rate_limit(max_wait=128),
     retry=retry_if_exception(is_rate_limit_error),
     reraise=True
 )
-def generate_card_design_json(design_brief: str) -> Dict[str, Any]:
+async def _analyze_board_parts(image_parts: List[types.Part]) -> str:
     """
-    Step 2c: Brief-to-Card (The "Designer")
-    Generate a structured JSON design based on the design brief.
+    Describe already downloaded board images and synthesize the design brief in one Gemini call.
     
     Args:
-        design_brief: The synthesized design brief
+        image_parts: One inline image part per downloaded image
     
     Returns:
-        Structured JSON object representing the card design
+        The design brief
+    
+    Raises:
+        ValueError: If the response has no brief or doesn't describe every image
     """
+    # The instructions are the same for every board - serve them from the context cache
+    response = await _agenerate_with_cached_instruction(
+        get_loop_client(),
+        model="gemini-2.5-flash",
+        system_instruction=BOARD_ANALYSIS_PROMPT,
+        contents=image_parts,
+        config=types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=BoardAnalysis,
+            http_options=FLEX_TIER_HTTP_OPTIONS
+        )
+    )
     
-    # Few-shot examples of kartenmacherei.de style cards
-    example_cards = """
-EXAMPLE 1 - Modern Minimalist:
-{
-  "card": {
-    "width": 148,
-    "height": 105,
-    "backgroundColor": "#FFFFFF"
-  },
-  "elements": [
-    {
-      "type": "text",
-      "content": "Einladung zur Hochzeit",
-      "font": "Sans-Serif",
-      "fontSize": 18,
-      "color": "#2C2C2C",
-      "position": {"x": 15, "y": 20}
-    },
-    {
-      "type": "text",
-      "content": "Emma & Lukas",
-      "font": "Serif",
-      "fontSize": 32,
-      "color": "#000000",
-      "position": {"x": 15, "y": 45}
-    },
-    {
-      "type": "text",
-      "content": "14. September 2025",
-      "font": "Sans-Serif",
-      "fontSize": 14,
-      "color": "#666666",
-      "position": {"x": 15, "y": 75}
-    }
-  ]
-}
+    analysis = response.parsed
+    if not isinstance(analysis, BoardAnalysis) or not analysis.design_brief:
+        raise ValueError("Board analysis response did not contain a design brief")
+    if len(analysis.descriptions) != len(image_parts):
+        # The model skipped or merged images - the brief may not reflect the whole board
+        raise ValueError(f"Board analysis described {len(analysis.descriptions)} of {len(image_parts)} images")
+    return analysis.design_brief
 
-EXAMPLE 2 - Romantic Boho:
-{
-  "card": {
-    "width": 148,
-    "height": 105,
-    "backgroundColor": "#F9F5F0"
-  },
-  "elements": [
-    {
-      "type": "text",
-      "content": "Save the Date",
-      "font": "Script",
-      "fontSize": 22,
-      "color": "#8B7355",
-      "position": {"x": 20, "y": 25}
-    },
-    {
-      "type": "text",
-      "content": "Sophie & Maximilian",
-      "font": "Script",
-      "fontSize": 28,
-      "color": "#D4AF37",
-      "position": {"x": 20, "y": 50}
-    },
-    {
-      "type": "decorative",
-      "content": "floral-branch",
-      "position": {"x": 110, "y": 15},
-      "size": {"width": 30, "height": 40},
-      "color": "#C9A88E"
-    }
-  ]
-}
 
-EXAMPLE 3 - Classic Elegant:
-{
-  "card": {
-    "width": 148,
-    "height": 105,
-    "backgroundColor": "#FAF8F3"
-  },
-  "elements": [
-    {
-      "type": "text",
-      "content": "Wir heiraten",
-      "font": "Serif",
-      "fontSize": 16,
-      "color": "#4A4A4A",
-      "position": {"x": 25, "y": 18}
-    },
-    {
-      "type": "text",
-      "content": "Anna & Markus",
-      "font": "Script",
-      "fontSize": 36,
-      "color": "#2C3E50",
-      "position": {"x": 25, "y": 45}
-    },
-    {
-      "type": "decorative",
-      "content": "heart-line",
-      "position": {"x": 60, "y": 75},
-      "size": {"width": 25, "height": 8},
-      "color": "#C5A48A"
-    },
-    {
-      "type": "text",
-      "content": "20.06.2025",
-      "font": "Serif",
-      "fontSize": 14,
-      "color": "#4A4A4A",
-      "position": {"x": 52, "y": 88}
-    }
-  ]
-}
-"""
+async def analyze_board_and_synthesize_brief(image_urls: List[str], use_cache: bool = True) -> str:
+    """
+    Steps 2a + 2b fused: describe all images and synthesize the design brief in ONE multimodal call.
+    
+    Sends every sampled image with a combined describe-then-synthesize prompt instead of
+    one description call per image followed by a text-only synthesis call, so the
+    instruction scaffolding is billed once and only one round-trip is needed.
+    The images are downloaded once; only the Gemini call is retried on rate limits.
     
-    prompt = f"""You are a senior graphic designer at kartenmacherei.de creating a wedding invitation that PERFECTLY matches this Pinterest-inspired design brief.
+    Args:
+        image_urls: List of image URLs (deduplicated and sampled to top 10 for performance)
+        use_cache: Reuse a cached brief for the same images. Pass False to generate a
+            new brief (e.g. on "Try Again")
+    
+    Returns:
+        A cohesive design brief for wedding invitation
+    
+    Raises:
+        Exception: If too many downloads fail or the response is unusable
+    """
+    sampled_urls = sample_image_urls(image_urls)
+    
+    # Download concurrently in worker threads (Gemini can't fetch Pinterest URLs itself)
+    downloads = await asyncio.gather(
+        *(_run_blocking(_download_image, url) for url in sampled_urls),
+        return_exceptions=True
+    )
+    image_parts = []
+    image_hashes = []
+    for url, download in zip(sampled_urls, downloads):
+        if isinstance(download, BaseException):
+            print(f"Failed to download image {url}: {type(download).__name__}: {str(download)}")
+            continue
+        image_bytes, mime_type = download
+        image_parts.extend(_image_analysis_parts(image_bytes, mime_type))
+        image_hashes.append(hashlib.sha256(image_bytes).hexdigest())
+    
+    failed_count = len(sampled_urls) - len(image_parts)
+    if failed_count > len(sampled_urls) // 2:
+        raise Exception(f"Too many image download failures ({failed_count}/{len(sampled_urls)})")
+    
+    # Re-submitted boards (same pictures in the same order) reuse their brief
+    cache_key = make_cache_key("gemini-2.5-flash", BOARD_ANALYSIS_PROMPT, *image_hashes)
+    if use_cache:
+        cached_brief = get_response_cache().get("board_brief", cache_key)
+        if cached_brief:
+            print("[CACHE] Reusing cached board design brief")
+            return cached_brief
+    
+    design_brief = await _analyze_board_parts(image_parts)
+    
+    get_response_cache().set("board_brief", cache_key, design_brief)
+    
+    print(f"Design brief generated in a single call from {len(image_parts)} images")
+    _debug_dump(f"DESIGN BRIEF GENERATED (single call, {len(image_parts)} images):", design_brief)
+    
+    return design_brief
 
-===== DESIGN BRIEF (YOUR ONLY REFERENCE) =====
-{design_brief}
-===============================================
+
+# Static part of the card design prompt (identical on every call, served from the context cache)
+CARD_DESIGN_SYSTEM_PROMPT = """You are a senior graphic designer at kartenmacherei.de creating a wedding invitation that PERFECTLY matches the Pinterest-inspired design brief you are given.
 
 MANDATORY RULES - VIOLATIONS WILL BE REJECTED:
 
 1. **COLORS - USE ONLY THESE 5 HEX CODES:**
-   - Extract the exact 5 hex codes from the COLOR PALETTE section above
+   - Extract the exact 5 hex codes from the COLOR PALETTE section of the design brief
    - Use ZERO colors outside this palette
    - Background: Use the lightest color from the palette
    - Text: Use darker colors for readability
    - Decorative elements: Use accent colors from the palette
-   - DO NOT use colors from the examples below (#FFFFFF, #2C2C2C, etc. are examples only)
 
 2. **AESTHETIC MATCH:**
    - If brief says "rustic boho" → use warm earthy tones, organic spacing, script fonts
@@ -431,94 +1318,298 @@ AVAILABLE DECORATIVE ELEMENTS (use these to represent the brief's motifs):
 - "dots-pattern": Subtle decorative dots
 
 OUTPUT REQUIREMENTS:
-1. Your ENTIRE response must be ONLY the JSON object - no additional text before or after
-2. Card dimensions: width=148mm, height=105mm (A6 landscape format)
-3. Include 2-5 text elements (e.g., "Save the Date", couple names, date, location)
-4. May include 0-2 decorative elements that match the brief's motifs
-5. All positions in millimeters from top-left corner
-6. All colors MUST come from the design brief's 5-color palette
-7. Font sizes: 12-40 for readability
-8. Choose background color from the brief's palette (usually the lightest or most neutral color)
-
-FORMAT REFERENCE EXAMPLES (structure only - create your own content based on the brief):
-{example_cards}
+1. Card dimensions: width=148mm, height=105mm (A6 landscape format)
+2. Include 2-5 text elements (e.g., "Save the Date", couple names, date, location) - text elements need font and fontSize; use the couple names and date exactly as given in the brief's CARD TEXT section
+3. May include 0-2 decorative elements that match the brief's motifs - decorative elements need size
+4. All positions in millimeters from top-left corner
+5. All colors MUST come from the design brief's 5-color palette
+6. Font sizes: 12-40 for readability
+7. Choose background color from the brief's palette (usually the lightest or most neutral color)"""
+
+class _CardJsonStreamTracker:
+    """
+    Incremental structure check for the card design JSON as it streams in.
+    
+    Tracks string/bracket state character by character so malformed output is detected
+    as soon as it appears, and counts the entries of the "elements" array that are
+    complete (objects closed directly inside an array of the root object).
+    """
+    
+    _CLOSING = {'}': '{', ']': '['}
+    
+    def __init__(self):
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._root_closed = False
+        self.completed_elements = 0
+    
+    def feed(self, text: str) -> None:
+        """
+        Consume the next chunk of JSON text.
+        
+        Raises:
+            ValueError: If the text so far cannot be the start of a single JSON object
+        """
+        for char in text:
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            
+            if char.isspace():
+                continue
+            if self._root_closed:
+                raise ValueError("Unexpected data after the end of the JSON object")
+            if not self._stack and char != '{':
+                raise ValueError(f"JSON object expected, got {char!r}")
+            
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._stack.append(char)
+            elif char in self._CLOSING:
+                if not self._stack or self._stack.pop() != self._CLOSING[char]:
+                    raise ValueError(f"Mismatched {char!r} in JSON output")
+                if char == '}' and self._stack == ['{', '[']:
+                    self.completed_elements += 1
+                if not self._stack:
+                    self._root_closed = True
+
+
+# Per-request part of the card design prompt (the static rules live in CARD_DESIGN_SYSTEM_PROMPT)
+CARD_DESIGN_PROMPT_TEMPLATE = """===== DESIGN BRIEF (YOUR ONLY REFERENCE) =====
+{design_brief}
+===============================================
 
 Now generate the JSON wedding invitation design that brings the design brief to life:"""
+
+# Version of the card design prompts and output schema, part of every card design cache key
+# so changing either invalidates previously cached designs
+CARD_DESIGN_CACHE_VERSION = make_cache_key(
+    CARD_DESIGN_SYSTEM_PROMPT,
+    CARD_DESIGN_PROMPT_TEMPLATE,
+    json.dumps(CardSpec.model_json_schema(), sort_keys=True)
+)
+
+
+def _card_design_cache_key(design_brief: str) -> str:
+    """Cache key of the card design generated from a design brief"""
+    return make_cache_key("gemini-2.5-pro", CARD_DESIGN_CACHE_VERSION, design_brief)
+
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_for_rate_limit(max_wait=128),
+    retry=retry_if_exception(lambda e: is_rate_limit_error(e) or isinstance(e, MalformedCardJsonError)),
+    reraise=True
+)
+def generate_card_design_json(
+    design_brief: str,
+    progress_callback=None,
+    use_cache: bool = True,
+    cache_result: bool = True,
+    stop_event: Optional[threading.Event] = None
+) -> Dict[str, Any]:
+    """
+    Step 2c: Brief-to-Card (The "Designer")
+    Generate a structured JSON design based on the design brief.
     
-    response = client.models.generate_content(
+    The response is streamed: the JSON structure is checked as it arrives so malformed
+    output aborts the stream immediately, and progress is reported per finished element.
+    
+    Args:
+        design_brief: The synthesized design brief
+        progress_callback: Optional callback for progress updates
+        use_cache: Reuse a cached design for the same brief. Pass False to generate a
+            new design (e.g. on "Try Again"); the new design still replaces the cached one.
+        cache_result: Store the generated design in the response cache
+        stop_event: Optional event that aborts the generation as soon as it is set
+    
+    Returns:
+        Structured JSON object representing the card design
+    
+    Raises:
+        EmptyResponseError: If Gemini returns no card design
+        MalformedCardJsonError: If the model output is not a valid card design (after retries)
+        CancelledError: If stop_event was set before the design was complete
+    """
+    cache_key = _card_design_cache_key(design_brief)
+    if use_cache:
+        cached_design = get_response_cache().get("card_design", cache_key)
+        if cached_design:
+            print("[CACHE] Reusing cached card design")
+            return _json_loads(cached_design)
+    
+    # Also checked here so a retry after a rate-limit backoff doesn't start a stopped generation
+    if stop_event is not None and stop_event.is_set():
+        raise CancelledError("Card design generation was stopped")
+    
+    prompt = CARD_DESIGN_PROMPT_TEMPLATE.format(design_brief=design_brief)
+    
+    stream = _stream_with_cached_instruction(
+        client,
         model="gemini-2.5-pro",
+        system_instruction=CARD_DESIGN_SYSTEM_PROMPT,
         contents=prompt,
         config=types.GenerateContentConfig(
-            response_mime_type="application/json"
+            response_mime_type="application/json",
+            response_schema=CardSpec,
+            http_options=PRIORITY_TIER_HTTP_OPTIONS
         )
     )
     
+    tracker = _CardJsonStreamTracker()
+    chunks = []
     try:
-        card_json = json.loads(response.text or "{}")
-        print("\n" + "="*80)
-        print("CARD DESIGN JSON GENERATED:")
-        print("="*80)
-        print(json.dumps(card_json, indent=2))
-        print("="*80 + "\n")
-        
-        # Validate palette adherence (extract colors from brief and card JSON)
-        import re
-        brief_colors = set(re.findall(r'#[0-9A-Fa-f]{6}', design_brief))
-        card_colors = set()
-        
-        # Extract all colors from the card JSON
-        if 'card' in card_json and 'backgroundColor' in card_json['card']:
-            card_colors.add(card_json['card']['backgroundColor'].upper())
-        if 'elements' in card_json:
-            for elem in card_json['elements']:
-                if 'color' in elem:
-                    card_colors.add(elem['color'].upper())
-        
-        # Normalize for comparison
-        brief_colors = {c.upper() for c in brief_colors}
-        
-        # Check if card colors are subset of brief colors
-        extra_colors = card_colors - brief_colors
-        if extra_colors:
-            print(f"\n⚠️ WARNING: Card uses colors not in brief palette!")
-            print(f"Brief palette: {sorted(brief_colors)}")
-            print(f"Card colors: {sorted(card_colors)}")
-            print(f"Extra colors: {sorted(extra_colors)}\n")
-        else:
-            print(f"\n✅ VALIDATION PASSED: All {len(card_colors)} card colors match brief palette\n")
-        
-        return card_json
-    except json.JSONDecodeError as e:
-        print(f"Error parsing JSON response: {str(e)}")
-        print(f"Response text: {response.text}")
-        raise Exception("Failed to generate valid JSON card design")
+        for chunk in stream:
+            if stop_event is not None and stop_event.is_set():
+                stream.close()
+                raise CancelledError("Card design generation was stopped")
+            text = chunk.text or ""
+            chunks.append(text)
+            
+            reported_elements = tracker.completed_elements
+            tracker.feed(text)
+            if progress_callback and tracker.completed_elements > reported_elements:
+                progress_callback(f"Designing card elements ({tracker.completed_elements} done)...", 60, 100)
+    except ValueError as e:
+        # Stop generating as soon as the output can no longer be valid JSON
+        stream.close()
+        print(f"Response text: {''.join(chunks)}")
+        raise MalformedCardJsonError(f"Failed to generate valid JSON card design: {str(e)}") from e
+    
+    response_text = ''.join(chunks)
+    if not response_text:
+        raise EmptyResponseError("Empty card design response")
+    try:
+        card_spec = CardSpec.model_validate_json(response_text)
+    except ValidationError as e:
+        print(f"Response text: {response_text}")
+        raise MalformedCardJsonError("Failed to generate valid JSON card design") from e
+    card_json = card_spec.model_dump(exclude_none=True)
+    
+    if cache_result:
+        get_response_cache().set("card_design", cache_key, _json_dumps(card_json))
+    
+    print(f"Card design generated with {len(card_json.get('elements', []))} elements")
+    if logger.isEnabledFor(logging.DEBUG):
+        _debug_dump("CARD DESIGN JSON GENERATED:", _json_dumps(card_json, indent=True))
+    
+    # Validate palette adherence
+    brief_colors = {c.upper() for c in HEX_COLOR_PATTERN.findall(design_brief)}
+    card_colors = set()
+    
+    # Extract all colors from the card JSON
+    if 'card' in card_json and 'backgroundColor' in card_json['card']:
+        card_colors.add(card_json['card']['backgroundColor'].upper())
+    if 'elements' in card_json:
+        for elem in card_json['elements']:
+            if 'color' in elem:
+                card_colors.add(elem['color'].upper())
+    
+    # Check if card colors are subset of brief colors
+    extra_colors = card_colors - brief_colors
+    if extra_colors:
+        print(f"\n⚠️ WARNING: Card uses colors not in brief palette!")
+        print(f"Brief palette: {sorted(brief_colors)}")
+        print(f"Card colors: {sorted(card_colors)}")
+        print(f"Extra colors: {sorted(extra_colors)}\n")
+    else:
+        print(f"\n✅ VALIDATION PASSED: All {len(card_colors)} card colors match brief palette\n")
+    
+    return card_json
 
 
-def create_image_generation_prompt(design_brief: str, card_json: Dict[str, Any]) -> str:
+class SpeculativeCardDesign:
     """
-    Convert design brief and card JSON into an image generation prompt.
+    Runs generate_card_design_json on a partial design brief in a background thread.
     
-    Args:
-        design_brief: The textual design brief
-        card_json: The structured card design JSON
-        
-    Returns:
-        Image generation prompt string
+    The result is only used if the final brief turns out to be a compatible extension
+    of the partial brief (see brief_extends_partial); otherwise the generation is stopped
+    and discarded. Speculative designs are never cached under the partial brief: a kept
+    design is cached under the final brief instead.
     """
-    import re
     
-    # Extract key information from brief
-    colors = re.findall(r'#[0-9A-Fa-f]{6}', design_brief)
-    
-    # Extract text content from card JSON
-    text_elements = []
-    for elem in card_json.get('elements', []):
-        if elem.get('type') == 'text':
-            text_elements.append(elem.get('content', ''))
+    def __init__(self):
+        self._partial_brief: Optional[str] = None
+        self._future: Optional[Future] = None
+        self._stop: Optional[threading.Event] = None
     
-    sample_text = ' / '.join(text_elements[:3]) if text_elements else 'Wedding Invitation'
+    def start(self, partial_brief: str) -> None:
+        """
+        Start designing the card from the partial brief.
+        
+        The brief is streamed once per synthesis attempt, so a second call means the
+        attempt that produced the running speculation failed and was retried: the old
+        speculation is stopped and replaced.
+        """
+        if self._future:
+            print("[SPECULATION] Brief synthesis was retried, restarting speculative card design")
+            self.cancel()
+        
+        print("[SPECULATION] Starting card design from partial brief")
+        self._partial_brief = partial_brief
+        self._future = Future()
+        self._stop = threading.Event()
+        threading.Thread(
+            target=self._run,
+            args=(partial_brief, self._future, self._stop),
+            name="speculative-card-design",
+            daemon=True
+        ).start()
+    
+    def cancel(self) -> None:
+        """Stop the running speculation; its result is discarded"""
+        if self._stop:
+            self._stop.set()
+        self._future = None
+        self._stop = None
+    
+    def result_for(self, final_brief: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the speculative card design if it is valid for the final brief.
+        
+        Args:
+            final_brief: The complete design brief
+        
+        Returns:
+            The card design JSON, or None if the speculation wasn't started, failed or is stale
+        """
+        if not self._future:
+            return None
+        if not brief_extends_partial(self._partial_brief, final_brief):
+            self.cancel()
+            return None
+        
+        try:
+            card_design = self._future.result()
+        except Exception as e:
+            print(f"[SPECULATION] Speculative card design failed: {str(e)}")
+            return None
+        
+        print("[SPECULATION] Reusing card design generated from partial brief")
+        get_response_cache().set("card_design", _card_design_cache_key(final_brief), _json_dumps(card_design))
+        return card_design
     
-    prompt = f"""Create a beautiful wedding invitation card in A6 landscape format (148mm × 105mm).
+    def _run(self, partial_brief: str, future: Future, stop: threading.Event) -> None:
+        try:
+            future.set_result(generate_card_design_json(
+                partial_brief,
+                use_cache=False,
+                cache_result=False,
+                stop_event=stop
+            ))
+        except BaseException as e:
+            future.set_exception(e)
+
+
+# Image generation prompt; filled in with the brief, sample card text and palette
+IMAGE_GENERATION_PROMPT_TEMPLATE = """Create a beautiful wedding invitation card in A6 landscape format (148mm × 105mm).
 
 AESTHETIC & STYLE:
 {design_brief}
@@ -526,7 +1617,7 @@ AESTHETIC & STYLE:
 DESIGN REQUIREMENTS:
 - Card dimensions: 148mm wide × 105mm tall (landscape orientation)
 - Include the text: "{sample_text}"
-- Match the color palette EXACTLY: {', '.join(colors[:5])}
+- Match the color palette EXACTLY: {palette}
 - High-quality print design, 300 DPI
 - Elegant, professional wedding stationery aesthetic
 - DO NOT include any photo borders, frames, or mockup elements - just the flat card design
@@ -541,32 +1632,89 @@ STYLE NOTES:
 - If the brief mentions "classic elegant" → use refined traditional design
 
 OUTPUT: A flat, print-ready wedding invitation card design (not a mockup, just the card itself)"""
+
+
+def _brief_card_text(design_brief: str) -> List[str]:
+    """Couple names and wedding date from the brief's CARD TEXT section (missing lines are skipped)"""
+    card_text = []
+    for pattern in (BRIEF_COUPLE_PATTERN, BRIEF_DATE_PATTERN):
+        match = pattern.search(design_brief)
+        if match:
+            card_text.append(match.group(1))
+    return card_text
+
+
+def create_image_generation_prompt(design_brief: str, card_json: Dict[str, Any]) -> str:
+    """
+    Convert design brief and card JSON into an image generation prompt.
+    
+    Args:
+        design_brief: The textual design brief
+        card_json: The structured card design JSON, used for the card text (may be
+            empty, in which case the names and date from the brief are used)
+        
+    Returns:
+        Image generation prompt string
+    """
+    # Extract key information from brief
+    colors = HEX_COLOR_PATTERN.findall(design_brief)
+    
+    # Extract text content from card JSON, falling back to the brief's card text
+    text_elements = []
+    for elem in card_json.get('elements', []):
+        if elem.get('type') == 'text':
+            text_elements.append(elem.get('content', ''))
+    if not text_elements:
+        text_elements = _brief_card_text(design_brief)
+    
+    sample_text = ' / '.join(text_elements[:3]) if text_elements else 'Wedding Invitation'
+    
+    prompt = IMAGE_GENERATION_PROMPT_TEMPLATE.format(
+        design_brief=design_brief,
+        sample_text=sample_text,
+        palette=', '.join(colors[:5])
+    )
     
     return prompt
 
 
+# File extensions of the image formats accepted from image generation, by MIME type
+GENERATED_IMAGE_EXTENSIONS = {
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/jpg": "jpg",
+    "image/webp": "webp",
+}
+
+
+def _record_image_rate_limit(retry_state: RetryCallState) -> None:
+    """Flag an image generation attempt that is backing off from a rate limit"""
+    rate_limited = retry_state.kwargs.get('rate_limited')
+    if rate_limited is not None:
+        rate_limited.set()
+
+
 @retry(
     stop=stop_after_attempt(5),
-    wait=wait_exponential(multiplier=1, min=2, max=64),
+    wait=wait_for_rate_limit(max_wait=64),
     retry=retry_if_exception(is_rate_limit_error),
+    before_sleep=_record_image_rate_limit,
     reraise=True
 )
-def generate_wedding_card_image(prompt: str) -> str:
+def _generate_card_image_once(prompt: str, rate_limited: Optional[threading.Event] = None) -> tuple[bytes, str]:
     """
-    Generate a wedding invitation image using Gemini 2.5 Flash Image (nano banana).
+    Make one image generation call and validate the returned image in memory.
     
     Args:
         prompt: Image generation prompt describing the wedding invitation
-        
-    Returns:
-        File path to the saved image
-    """
-    import base64
-    from pathlib import Path
-    from datetime import datetime
+        rate_limited: Optional event set when the call hits a rate limit and backs off
     
-    print("[IMAGE GENERATION] Calling Gemini 2.5 Flash Image (nano banana)...")
+    Returns:
+        Tuple of (image bytes, file extension), with WebP already converted to PNG
     
+    Raises:
+        ValueError: If the response contains no valid image
+    """
     response = client.models.generate_content(
         model="gemini-2.5-flash-image",
         contents=prompt,
@@ -612,63 +1760,135 @@ def generate_wedding_card_image(prompt: str) -> str:
     print(f"[IMAGE GENERATION] Aggregated {len(all_image_bytes)} part(s) → {len(image_bytes)} total bytes")
     
     # Determine file extension from MIME type - support PNG, JPEG, WebP
-    mime_lower = mime_type.lower()
-    if "png" in mime_lower:
-        ext = "png"
-    elif "jpeg" in mime_lower or "jpg" in mime_lower:
-        ext = "jpg"
-    elif "webp" in mime_lower:
-        ext = "webp"
-    else:
-        # Unsupported format - try to detect from bytes or default to PNG
+    ext = GENERATED_IMAGE_EXTENSIONS.get(mime_type.lower())
+    if not ext:
+        # Unsupported format - try to detect from bytes
         print(f"[IMAGE GENERATION] ⚠️ Unsupported MIME type {mime_type}")
-        if image_bytes.startswith(b'\x89PNG'):
-            ext = "png"
-        elif image_bytes.startswith(b'\xff\xd8\xff'):
-            ext = "jpg"
-        elif image_bytes.startswith(b'RIFF') and b'WEBP' in image_bytes[:20]:
-            ext = "webp"
-        else:
+        ext = GENERATED_IMAGE_EXTENSIONS.get(_sniff_mime(image_bytes))
+        if not ext:
             raise ValueError(f"Unsupported image format: {mime_type} and unable to detect from bytes")
     
-    # Save image to file
+    # Validate before anything is written, so a corrupted attempt leaves no file behind.
+    # A full decode catches truncated data, and WebP is converted from the same decode.
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            img.load()
+            
+            # If it's WebP, convert to PNG for better Streamlit compatibility
+            if ext == "webp":
+                print(f"[IMAGE GENERATION] Converting WebP to PNG for better compatibility...")
+                output = io.BytesIO()
+                img.save(output, 'PNG')
+                image_bytes, ext = output.getvalue(), "png"
+    except Exception as validation_error:
+        print(f"[IMAGE GENERATION] ❌ Image validation failed: {validation_error}")
+        raise ValueError(f"Generated image failed validation: {validation_error}")
+    
+    return image_bytes, ext
+
+
+def _save_card_image(image_bytes: bytes, ext: str) -> str:
+    """
+    Save a validated generated image.
+    
+    Returns:
+        File path to the saved image
+    """
     output_dir = Path("generated_wedding_cards")
     output_dir.mkdir(exist_ok=True)
     
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     output_path = output_dir / f"wedding_card_{timestamp}.{ext}"
-    
     output_path.write_bytes(image_bytes)
     
-    # Validate the saved image using PIL and convert WebP to PNG if needed
-    try:
-        from PIL import Image
-        with Image.open(output_path) as img:
-            img.verify()  # Verify it's a valid image
+    print(f"[IMAGE GENERATION] ✅ Saved and validated AI-generated image: {output_path} ({len(image_bytes)} bytes)")
+    return str(output_path)
+
+
+def generate_wedding_card_image(prompt: str) -> str:
+    """
+    Generate a wedding invitation image using Gemini 2.5 Flash Image (nano banana).
+    
+    Image generation is the slowest call of the pipeline, so its tail is hedged: if the
+    first attempt hasn't produced a valid image after IMAGE_GENERATION_HEDGE_AFTER_SECONDS
+    (or fails), a second attempt is started and whichever valid image arrives first wins.
+    No hedge is sent once the first attempt has hit a rate limit, so the API's backoff
+    isn't answered with twice the requests.
+    
+    Args:
+        prompt: Image generation prompt describing the wedding invitation
         
-        # If it's WebP, convert to PNG for better Streamlit compatibility
-        if ext == "webp":
-            print(f"[IMAGE GENERATION] Converting WebP to PNG for better compatibility...")
-            with Image.open(output_path) as img:
-                img.load()  # Load after verify (verify invalidates the image)
-                png_path = output_path.with_suffix('.png')
-                img.save(png_path, 'PNG')
-            output_path.unlink()  # Delete the WebP file
-            output_path = png_path
-            print(f"[IMAGE GENERATION] ✅ Converted to PNG: {output_path}")
+    Returns:
+        File path to the saved image
+    
+    Raises:
+        ValueError: If no attempt produced a valid image
+    """
+    print("[IMAGE GENERATION] Calling Gemini 2.5 Flash Image (nano banana)...")
+    
+    rate_limited = threading.Event()
+    attempts = [_EXECUTOR.submit(_generate_card_image_once, prompt, rate_limited=rate_limited)]
+    done, _ = wait(attempts, timeout=IMAGE_GENERATION_HEDGE_AFTER_SECONDS)
+    if rate_limited.is_set():
+        print("[IMAGE GENERATION] First attempt was rate limited - waiting for it instead of hedging")
+    elif not done or attempts[0].exception() is not None:
+        print("[IMAGE GENERATION] First attempt slow or failed - starting a hedged second attempt")
+        attempts.append(_EXECUTOR.submit(_generate_card_image_once, prompt))
+    
+    last_error = None
+    for attempt in as_completed(attempts):
+        try:
+            image_bytes, ext = attempt.result()
+        except Exception as e:
+            last_error = e
+            continue
         
-        print(f"[IMAGE GENERATION] ✅ Saved and validated AI-generated image: {output_path} ({len(image_bytes)} bytes)")
-        return str(output_path)
-    except Exception as validation_error:
-        # Image is corrupted - delete it and raise error
-        output_path.unlink(missing_ok=True)
-        print(f"[IMAGE GENERATION] ❌ Image validation failed: {validation_error}")
-        raise ValueError(f"Generated image failed validation: {validation_error}")
+        # Best effort: drop the other attempt if it hasn't started yet. A running call
+        # can't be interrupted and finishes (and is billed) in the background.
+        for other in attempts:
+            if not other.cancel() and not other.done():
+                print("[IMAGE GENERATION] Losing attempt already running - it can't be cancelled and finishes in the background")
+        return _save_card_image(image_bytes, ext)
+    
+    raise last_error
+
+
+async def _analyze_board(
+    image_urls: List[str],
+    progress_callback=None,
+    use_batch: bool = False,
+    use_cache: bool = True
+) -> tuple[Optional[str], List[str]]:
+    """
+    Run the async image analysis steps of the pipeline on a single event loop.
+    
+    Tries the single-call board analysis first and falls back to per-image analysis.
+    
+    Returns:
+        Tuple of (design brief, image descriptions): the brief if the single call
+        succeeded, otherwise None and the per-image descriptions to synthesize from
+    """
+    if not use_batch:
+        # Fast path: one multimodal call for all images
+        try:
+            return await analyze_board_and_synthesize_brief(image_urls, use_cache=use_cache), []
+        except Exception as e:
+            print(f"⚠️ Single-call board analysis failed: {str(e)}")
+            print("Falling back to per-image analysis")
+    
+    descriptions = await analyze_images_batch(
+        image_urls, 
+        progress_callback,
+        use_batch=use_batch
+    )
+    return None, descriptions
 
 
 def generate_wedding_card_from_pinterest(
     image_urls: List[str], 
-    progress_callback=None
+    progress_callback=None,
+    use_batch: bool = False,
+    use_cache: bool = True
 ) -> Dict[str, Any]:
     """
     Complete pipeline to generate a wedding card design from Pinterest images.
@@ -676,52 +1896,73 @@ def generate_wedding_card_from_pinterest(
     Args:
         image_urls: List of Pinterest image URLs
         progress_callback: Optional callback for progress updates
+        use_batch: Analyze images via the Gemini Batch API (see analyze_images_batch)
+        use_cache: Reuse cached results for the same board. Pass False to regenerate
+            (e.g. on "Try Again")
     
     Returns:
         Complete card design as JSON object with AI-generated image path
     """
     # Step 1: Analyze images (already done via pinterest_scraper)
     
-    # Step 2a: Image-to-Description
+    # Steps 2a + 2b: Image-to-Description and Description-to-Brief
     if progress_callback:
         progress_callback("Analyzing images...", 0, 100)
     
-    descriptions = analyze_images_batch(
-        image_urls, 
-        progress_callback
+    # All async analysis runs on one event loop, sharing its Gemini client and connections
+    design_brief, descriptions = asyncio.run(
+        _analyze_board(image_urls, progress_callback, use_batch, use_cache)
     )
     
-    # Step 2b: Description-to-Brief
-    if progress_callback:
-        progress_callback("Creating design brief...", 40, 100)
+    card_design = None
+    if not design_brief:
+        if progress_callback:
+            progress_callback("Creating design brief...", 40, 100)
+        
+        # Start the card design as soon as palette and typography are streamed
+        speculation = SpeculativeCardDesign()
+        try:
+            design_brief = synthesize_design_brief(
+                descriptions,
+                on_partial_brief=speculation.start,
+                use_cache=use_cache
+            )
+        except BaseException:
+            speculation.cancel()
+            raise
+        card_design = speculation.result_for(design_brief)
+    
+    # Step 2d: RENDER FINAL CARD WITH AI IMAGE GENERATION (nano banana)
+    # The image only needs the brief, so it renders while the card JSON is generated.
+    # Card text comes from the speculative card design if it was kept, else from the brief.
+    image_prompt = create_image_generation_prompt(design_brief, card_design or {})
+    
+    _debug_dump("IMAGE GENERATION PROMPT:", image_prompt)
     
-    design_brief = synthesize_design_brief(descriptions)
+    image_generation = _PIPELINE_EXECUTOR.submit(generate_wedding_card_image, image_prompt)
     
     # Step 2c: Brief-to-Card JSON (for validation - no metadata yet)
     if progress_callback:
         progress_callback("Generating design structure...", 60, 100)
     
-    card_design = generate_card_design_json(design_brief)
+    try:
+        if card_design is None:
+            card_design = generate_card_design_json(design_brief, progress_callback, use_cache=use_cache)
+    except BaseException:
+        # Don't leave the image generation running behind a failed pipeline
+        if not image_generation.cancel():
+            wait([image_generation])
+        raise
     
-    # Step 2d: RENDER FINAL CARD WITH AI IMAGE GENERATION (nano banana)
     if progress_callback:
         progress_callback("Rendering your beautiful wedding invitation with AI...", 80, 100)
     
-    # Create image generation prompt from the design brief
-    image_prompt = create_image_generation_prompt(design_brief, card_design)
-    
-    print("\n" + "="*80)
-    print("IMAGE GENERATION PROMPT:")
-    print("="*80)
-    print(image_prompt)
-    print("="*80 + "\n")
-    
-    # Generate the actual wedding invitation image
+    # Wait for the actual wedding invitation image
     generated_image_path = None
     image_generation_error = None
     
     try:
-        generated_image_path = generate_wedding_card_image(image_prompt)
+        generated_image_path = image_generation.result()
     except Exception as e:
         print(f"⚠️ Image generation failed: {str(e)}")
         print("Falling back to JSON-only output")
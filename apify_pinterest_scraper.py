@@ -3,9 +3,60 @@ Apify Pinterest board scraper integration.
 Uses Apify's Pinterest Scraper to reliably fetch images from any public Pinterest board.
 """
 
+import json
 import os
-from typing import List
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from typing import Iterator, List, Optional
+import requests
+from urllib3.util.retry import Retry
 from apify_client import ApifyClient
+from response_cache import get_response_cache, make_cache_key
+
+
+# Scraped boards are reused for an hour through the persistent response cache, shared across
+# processes and restarts (app.py keeps an in-memory cache with the same lifetime in front of it)
+BOARD_CACHE_TTL_SECONDS = 60 * 60
+
+# Apify holds a run-status request open until the run finishes, for at most 60 seconds
+APIFY_WAIT_FOR_FINISH_SECONDS = 60
+APIFY_RUN_TIMEOUT_SECONDS = 600
+APIFY_TERMINAL_STATUSES = {"SUCCEEDED", "FAILED", "ABORTED", "TIMED-OUT"}
+
+# Apify proxy settings: the default datacenter pool first, residential proxies as a fallback
+DATACENTER_PROXY_CONFIG = {"useApifyProxy": True}
+RESIDENTIAL_PROXY_CONFIG = {"useApifyProxy": True, "apifyProxyGroups": ["RESIDENTIAL"]}
+
+# Downscaled Pinterest CDN size segments that can be swapped for the original image
+PINTEREST_THUMBNAIL_SIZE_PATTERN = re.compile(r'/(?:236x|474x|564x|736x)/')
+
+# Pinterest keeps only some sizes of each pin, so /originals/ URLs are checked with HEAD requests
+# before use and replaced by the 564x size when the original is missing
+ORIGINALS_FALLBACK_SIZE = '/564x/'
+URL_VALIDATION_WORKERS = 8
+
+# Pooled, retrying session for the pinimg.com checks
+_SESSION = requests.Session()
+_SESSION.mount("https://", requests.adapters.HTTPAdapter(
+    pool_connections=10, pool_maxsize=20, max_retries=Retry(total=2, backoff_factor=0.2)
+))
+_SESSION.headers['User-Agent'] = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+# Dataset item fields holding an image URL, in priority order. danielmilevski9/pinterest-crawler
+# nests it as image.url; the plain string fields are fallbacks for other scrapers.
+IMAGE_URL_FIELDS = ("image", "imageUrl")
+# Keys of a size-keyed "images" dict, from original to largest downscaled size
+IMAGES_DICT_SIZE_KEYS = ("orig", "original", "1200x")
+
+# Dataset items are fetched in pages; pages after the first are fetched concurrently
+DATASET_PAGE_SIZE = 100
+DATASET_FETCH_WORKERS = 4
+
+# Items fetched per requested image, leaving room for items without a usable image URL
+DATASET_ITEMS_PER_IMAGE = 2
 
 
 class ApifyPinterestError(Exception):
@@ -13,6 +64,203 @@ class ApifyPinterestError(Exception):
     pass
 
 
+@lru_cache(maxsize=1)
+def _get_client(api_token: str) -> ApifyClient:
+    """
+    Get a shared Apify client so HTTP connections are reused across scrapes.
+    
+    apify-client 2.x sends requests through impit (Rust/reqwest), not httpx, and negotiates
+    HTTP/2 with api.apify.com over ALPN. Concurrent dataset page fetches and status polls
+    therefore already multiplex over this client's connection.
+    """
+    return ApifyClient(api_token)
+
+
+def warm_up_client() -> None:
+    """
+    Create the shared Apify client and open its connection ahead of the first scrape.
+    
+    Makes one cheap authenticated request so the TLS handshake and token check are done
+    before the user clicks "Generate". Failures are ignored; the scrape reports them.
+    """
+    api_token = os.getenv('APIFY_API_TOKEN')
+    if not api_token:
+        return
+    try:
+        _get_client(api_token).user().get()
+    except Exception as e:
+        print(f"[APIFY] Client warm-up failed: {str(e)}")
+
+
+def _fetch_dataset_items(client: ApifyClient, dataset_id: str, max_items: int) -> List[dict]:
+    """
+    Fetch up to max_items items of an Apify dataset, requesting the pages after the first in parallel.
+    
+    Args:
+        client: Apify client (its pooled HTTP connections are shared by the page requests)
+        dataset_id: ID of the dataset to read
+        max_items: Maximum number of items to fetch (pages past it are never requested)
+    
+    Returns:
+        Dataset items in their original order
+    """
+    dataset = client.dataset(dataset_id)
+    
+    # Boards within one page (the usual max_images) are fetched in this single request.
+    # clean=True skips empty items and hidden fields, so offsets below count raw dataset items.
+    first_limit = min(DATASET_PAGE_SIZE, max_items)
+    first_page = dataset.list_items(offset=0, limit=first_limit, clean=True)
+    items = list(first_page.items)
+    
+    offsets = range(first_limit, min(first_page.total, max_items), DATASET_PAGE_SIZE)
+    if not first_page.items or not offsets:
+        return items
+    
+    def fetch_page(offset: int) -> List[dict]:
+        return dataset.list_items(
+            offset=offset, limit=min(DATASET_PAGE_SIZE, max_items - offset), clean=True
+        ).items
+    
+    with ThreadPoolExecutor(max_workers=DATASET_FETCH_WORKERS) as executor:
+        for page_items in executor.map(fetch_page, offsets):
+            items.extend(page_items)
+    
+    return items
+
+
+def _extract_image_url(item: dict) -> Optional[str]:
+    """
+    Find the image URL of a scraped dataset item.
+    
+    Args:
+        item: Dataset item returned by the Pinterest scraper actor
+    
+    Returns:
+        Image URL, or None if the item has no recognizable image field
+    """
+    image = item.get("image")
+    if isinstance(image, dict):
+        return image.get("url")
+    
+    for field in IMAGE_URL_FIELDS:
+        value = item.get(field)
+        if value and isinstance(value, str):
+            return value
+    
+    # Sometimes images is a dict with different sizes, or a list of URLs
+    images = item.get("images")
+    if isinstance(images, dict):
+        for key in IMAGES_DICT_SIZE_KEYS:
+            value = images.get(key)
+            if value:
+                return value
+    elif isinstance(images, list) and images:
+        return images[0]
+    return None
+
+
+def _run_scraper_actor(client: ApifyClient, board_url: str, max_images: int, proxy_config: dict) -> List[dict]:
+    """
+    Run the Pinterest scraper actor on a board and fetch its dataset items.
+    
+    Args:
+        client: Apify client
+        board_url: Full URL of the Pinterest board
+        max_images: Maximum number of images to fetch
+        proxy_config: Apify proxy configuration for the run
+    
+    Returns:
+        Dataset items, or an empty list if the run did not succeed (e.g. blocked by Pinterest)
+    
+    Raises:
+        ApifyPinterestError: If the run does not finish within APIFY_RUN_TIMEOUT_SECONDS
+    """
+    # Use danielmilevski9's Pinterest Scraper (best general-purpose scraper)
+    # Actor ID: danielmilevski9/pinterest-crawler
+    actor_input = {
+        "startUrls": [{"url": board_url}],
+        "resultsLimit": max_images,
+        "proxyConfig": proxy_config
+    }
+    
+    # Start the actor and long-poll its status (one request per minute at most)
+    run = client.actor("danielmilevski9/pinterest-crawler").start(
+        run_input=actor_input,
+        wait_for_finish=APIFY_WAIT_FOR_FINISH_SECONDS
+    )
+    deadline = time.monotonic() + APIFY_RUN_TIMEOUT_SECONDS
+    while run["status"] not in APIFY_TERMINAL_STATUSES:
+        if time.monotonic() >= deadline:
+            client.run(run["id"]).abort()
+            raise ApifyPinterestError(
+                f"Apify scraping timed out. The board may be very large. Please try again."
+            )
+        run = client.run(run["id"]).wait_for_finish(wait_secs=APIFY_WAIT_FOR_FINISH_SECONDS) or run
+    
+    if run["status"] != "SUCCEEDED":
+        print(f"[APIFY] Scraping run ended with status {run['status']}")
+        return []
+    
+    # Fetch results from the dataset
+    return _fetch_dataset_items(
+        client, run["defaultDatasetId"], max_items=max_images * DATASET_ITEMS_PER_IMAGE
+    )
+
+
+def _iter_image_urls(dataset_items: List[dict]) -> Iterator[str]:
+    """Yield the unique, full-resolution image URLs of scraped dataset items in order"""
+    seen_urls = set()
+    for item in dataset_items:
+        img_url = _extract_image_url(item)
+        if not img_url or not isinstance(img_url, str):
+            continue
+        
+        # Ensure we get high quality images (though Apify already returns originals)
+        img_url = PINTEREST_THUMBNAIL_SIZE_PATTERN.sub('/originals/', img_url, count=1)
+        
+        # Repins of the same image share one CDN URL; analyze it only once
+        if img_url in seen_urls:
+            continue
+        seen_urls.add(img_url)
+        yield img_url
+
+
+def _image_url_exists(image_url: str) -> bool:
+    """Check an image URL with a HEAD request (network errors count as existing)"""
+    try:
+        response = _SESSION.head(image_url, timeout=5, allow_redirects=True)
+    except requests.RequestException:
+        return True
+    return response.status_code not in (403, 404)
+
+
+def _resolve_original_url(image_url: str) -> Optional[str]:
+    """Return the URL if it exists, else its 564x variant if that exists, else None"""
+    if '/originals/' not in image_url or _image_url_exists(image_url):
+        return image_url
+    
+    fallback_url = image_url.replace('/originals/', ORIGINALS_FALLBACK_SIZE, 1)
+    if _image_url_exists(fallback_url):
+        return fallback_url
+    print(f"[APIFY] Dropping unavailable image: {image_url}")
+    return None
+
+
+def _validate_image_urls(image_urls: List[str]) -> List[str]:
+    """
+    Check /originals/ image URLs concurrently, falling back to a smaller size when missing.
+    
+    Args:
+        image_urls: Image URLs collected from the scraped board
+    
+    Returns:
+        Usable image URLs in their original order (unavailable images are dropped)
+    """
+    with ThreadPoolExecutor(max_workers=URL_VALIDATION_WORKERS) as executor:
+        resolved_urls = list(executor.map(_resolve_original_url, image_urls))
+    return [url for url in resolved_urls if url]
+
+
 def extract_pinterest_board_images_apify(board_url: str, max_images: int = 30) -> List[str]:
     """
     Extract image URLs from a public Pinterest board using Apify's Pinterest Scraper.
@@ -30,6 +278,20 @@ def extract_pinterest_board_images_apify(board_url: str, max_images: int = 30) -
     Raises:
         ApifyPinterestError: If scraping fails or API key is missing
     """
+    cache_key = make_cache_key(board_url, str(max_images))
+    # Same lifetime as the in-memory cache, so new pins on a board show up within the hour
+    cached_urls = get_response_cache().get("apify_board_images", cache_key, ttl_seconds=BOARD_CACHE_TTL_SECONDS)
+    if cached_urls is not None:
+        print(f"[CACHE] Reusing scraped pins for {board_url}")
+        return json.loads(cached_urls)
+    
+    image_urls = _scrape_uncached(board_url, max_images)
+    get_response_cache().set("apify_board_images", cache_key, json.dumps(image_urls))
+    return image_urls
+
+
+def _scrape_uncached(board_url: str, max_images: int) -> List[str]:
+    """Scrape a board through Apify without the response cache (see extract_pinterest_board_images_apify)"""
     # Get Apify API token from environment
     api_token = os.getenv('APIFY_API_TOKEN')
     if not api_token:
@@ -38,25 +300,13 @@ def extract_pinterest_board_images_apify(board_url: str, max_images: int = 30) -
         )
     
     try:
-        # Initialize Apify client
-        client = ApifyClient(api_token)
-        
-        # Use danielmilevski9's Pinterest Scraper (best general-purpose scraper)
-        # Actor ID: danielmilevski9/pinterest-crawler
-        actor_input = {
-            "startUrls": [{"url": board_url}],
-            "resultsLimit": max_images,
-            "proxyConfig": {
-                "useApifyProxy": True,
-                "apifyProxyGroups": ["RESIDENTIAL"]
-            }
-        }
-        
-        # Run the actor and wait for it to finish
-        run = client.actor("danielmilevski9/pinterest-crawler").call(run_input=actor_input)
+        client = _get_client(api_token)
         
-        # Fetch results from the dataset
-        dataset_items = list(client.dataset(run["defaultDatasetId"]).iterate_items())
+        # Datacenter proxies are much faster and cheaper; residential ones only for boards that block them
+        dataset_items = _run_scraper_actor(client, board_url, max_images, DATACENTER_PROXY_CONFIG)
+        if not dataset_items:
+            print("[APIFY] No pins scraped through datacenter proxies, retrying with residential proxies")
+            dataset_items = _run_scraper_actor(client, board_url, max_images, RESIDENTIAL_PROXY_CONFIG)
         
         if not dataset_items:
             raise ApifyPinterestError(
@@ -65,40 +315,9 @@ def extract_pinterest_board_images_apify(board_url: str, max_images: int = 30) -
             )
         
         # Extract image URLs from the results
-        image_urls = []
-        for item in dataset_items:
-            # Try different possible image URL fields
-            img_url = None
-            
-            # danielmilevski9/pinterest-crawler returns nested structure
-            if 'image' in item and isinstance(item['image'], dict):
-                img_url = item['image'].get('url')
-            # Fallback for other scrapers
-            elif 'image' in item and isinstance(item['image'], str):
-                img_url = item['image']
-            elif 'imageUrl' in item and item['imageUrl']:
-                img_url = item['imageUrl']
-            elif 'images' in item and item['images']:
-                # Sometimes images is a dict with different sizes
-                if isinstance(item['images'], dict):
-                    # Try to get original or largest size
-                    img_url = item['images'].get('orig') or item['images'].get('original') or item['images'].get('1200x')
-                elif isinstance(item['images'], list) and len(item['images']) > 0:
-                    img_url = item['images'][0]
-            
-            if img_url and isinstance(img_url, str):
-                # Ensure we get high quality images (though Apify already returns originals)
-                if '/236x/' in img_url:
-                    img_url = img_url.replace('/236x/', '/originals/')
-                elif '/474x/' in img_url:
-                    img_url = img_url.replace('/474x/', '/originals/')
-                elif '/564x/' in img_url:
-                    img_url = img_url.replace('/564x/', '/originals/')
-                
-                image_urls.append(img_url)
-            
-            if len(image_urls) >= max_images:
-                break
+        image_urls = list(islice(_iter_image_urls(dataset_items), max_images))
+        
+        image_urls = _validate_image_urls(image_urls)
         
         if not image_urls:
             raise ApifyPinterestError(
@@ -1,13 +1,22 @@
 import streamlit as st
 import json
+import threading
 import time
 from datetime import datetime
+from PIL import Image
 from pinterest_scraper import validate_pinterest_url, MIN_REQUIRED_IMAGES
-from apify_pinterest_scraper import extract_pinterest_board_images_apify, ApifyPinterestError
-from ai_card_generator import generate_wedding_card_from_pinterest
 from card_schema import validate_card_design
 from card_renderer import render_card_design
 
+try:
+    import orjson
+except ImportError:  # Optional speedup; falls back to the stdlib json module
+    orjson = None
+
+# Longest side of the structured on-screen preview. The render DPI is derived from it so the
+# preview is drawn directly at display size instead of at print resolution.
+PREVIEW_MAX_SIZE_PX = 1200
+
 st.set_page_config(
     page_title="Pinterest Wedding Card Generator",
     layout="wide"
@@ -35,6 +44,49 @@ if 'pinterest_url' not in st.session_state:
     st.session_state.pinterest_url = ""
 if 'generation_count' not in st.session_state:
     st.session_state.generation_count = 0
+if 'url_to_images' not in st.session_state:
+    st.session_state.url_to_images = {}
+
+
+@st.cache_resource(show_spinner=False)
+def start_apify_warm_up():
+    """Warm up the Apify client in the background, once per server process"""
+    def warm_up():
+        from apify_pinterest_scraper import warm_up_client
+        warm_up_client()
+    
+    threading.Thread(target=warm_up, name="apify-warm-up", daemon=True).start()
+
+
+start_apify_warm_up()
+
+
+@st.cache_data(show_spinner=False, hash_funcs={dict: lambda d: json.dumps(d, sort_keys=True, default=str)})
+def cached_preview(design: dict) -> Image.Image:
+    """Render the structured preview once per design instead of on every rerun"""
+    card_info = design.get('card', {})
+    longest_side_mm = max(card_info.get('width', 148), card_info.get('height', 105))
+    return render_card_design(design, dpi=int(PREVIEW_MAX_SIZE_PX * 25.4 / longest_side_mm))
+
+
+# Lifetime of cached board scrapes (matches apify_pinterest_scraper.BOARD_CACHE_TTL_SECONDS,
+# which isn't imported here so the scraper stays out of the first page load)
+BOARD_CACHE_TTL_SECONDS = 60 * 60
+
+
+@st.cache_data(ttl=BOARD_CACHE_TTL_SECONDS, show_spinner=False)
+def cached_board_images(board_url: str, max_images: int):
+    """Scrape a board through Apify at most once per URL and hour (e.g. across "Try Again")"""
+    from apify_pinterest_scraper import extract_pinterest_board_images_apify
+    return extract_pinterest_board_images_apify(board_url, max_images=max_images)
+
+
+@st.cache_data(show_spinner=False)
+def design_json(design: dict) -> bytes:
+    """Serialize a design for download once per design (orjson when installed)"""
+    if orjson is not None:
+        return orjson.dumps(design, option=orjson.OPT_INDENT_2)
+    return json.dumps(design, indent=2).encode('utf-8')
 
 
 def progress_callback(message: str, current: int, total: int):
@@ -67,6 +119,10 @@ with col1:
             regenerate_button = False
     
     if generate_button or regenerate_button:
+        # Imported here so the scraper and Gemini clients don't slow down the first page load
+        from apify_pinterest_scraper import ApifyPinterestError
+        from ai_card_generator import generate_wedding_card_from_pinterest
+        
         # Validate Pinterest board URL
         if not pinterest_url:
             st.error("Please enter a Pinterest board URL")
@@ -82,8 +138,16 @@ with col1:
             st.session_state.pinterest_url = pinterest_url
             with st.spinner("Fetching pins from Pinterest board via Apify..."):
                 try:
-                    image_urls = extract_pinterest_board_images_apify(pinterest_url, max_images=25)
-                    
+                    # Reuse this session's scrape of the same board (e.g. on "Try Again")
+                    image_urls = st.session_state.url_to_images.get(pinterest_url)
+                    if image_urls is None:
+                        image_urls = cached_board_images(pinterest_url, max_images=25)
+                        if len(image_urls) >= MIN_REQUIRED_IMAGES:
+                            st.session_state.url_to_images[pinterest_url] = image_urls
+                        else:
+                            # Don't keep an empty or too small scrape - the next attempt scrapes again
+                            cached_board_images.clear(pinterest_url, max_images=25)
+
                     if not image_urls:
                         st.error(f"No pins found on this board. Please check the URL and ensure the board is public and contains images.")
                         st.stop()
@@ -111,9 +175,11 @@ with col1:
                 status_text.text(message)
             
             with st.spinner("Analyzing your wedding aesthetic with AI..."):
+                # "Try Again" must produce a new design, not the cached one
                 card_design = generate_wedding_card_from_pinterest(
                     image_urls,
-                    progress_callback=update_progress
+                    progress_callback=update_progress,
+                    use_cache=not regenerate_button
                 )
             
             elapsed_time = time.time() - start_time
@@ -134,9 +200,8 @@ with col1:
                 
         except Exception as e:
             st.error(f"Error generating design: {str(e)}")
-            import traceback
             with st.expander("Technical Details"):
-                st.code(traceback.format_exc())
+                st.exception(e)
 
 with col2:
     st.subheader("How It Works")
@@ -182,7 +247,7 @@ if st.session_state.generated_design:
                 st.warning(f"AI image generation failed: {design['_image_generation_error']}")
             
             try:
-                card_image = render_card_design(design, dpi=150)
+                card_image = cached_preview(design)
                 st.image(card_image, caption="Design Preview (PIL Renderer)", use_container_width=True)
                 st.info("Note: This is a simplified preview. For Pinterest-quality designs, AI image generation is recommended.")
             except Exception as e:
@@ -196,25 +261,24 @@ if st.session_state.generated_design:
                 """)
     
     with col_details:
-        st.markdown("### Design Details")
-        
         card_info = design.get('card', {})
-        st.markdown(f"""
-        **Card Size**: {card_info.get('width', 148)}mm × {card_info.get('height', 105)}mm (A6)  
-        **Background**: {card_info.get('backgroundColor', '#FFFFFF')}
-        """)
-        
         elements = design.get('elements', [])
         text_elements = [e for e in elements if e.get('type') == 'text']
         decorative_elements = [e for e in elements if e.get('type') == 'decorative']
         
-        st.markdown(f"""
-        **Text Elements**: {len(text_elements)}  
-        **Decorative Elements**: {len(decorative_elements)}
-        """)
-        
+        # One markdown message for the whole pane instead of one per section
+        details_md = f"""
+### Design Details
+
+**Card Size**: {card_info.get('width', 148)}mm × {card_info.get('height', 105)}mm (A6)  
+**Background**: {card_info.get('backgroundColor', '#FFFFFF')}
+
+**Text Elements**: {len(text_elements)}  
+**Decorative Elements**: {len(decorative_elements)}
+"""
         if '_source_images_count' in design:
-            st.markdown(f"**Source Images Analyzed**: {design['_source_images_count']}")
+            details_md += f"\n**Source Images Analyzed**: {design['_source_images_count']}\n"
+        st.markdown(details_md)
         
         if '_design_brief' in design:
             with st.expander("View Design Brief"):
@@ -226,7 +290,7 @@ if st.session_state.generated_design:
         
         st.download_button(
             label="Download JSON",
-            data=json.dumps(display_design, indent=2),
+            data=design_json(display_design),
             file_name=f"wedding_card_design_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
             mime="application/json",
             use_container_width=True
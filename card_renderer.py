@@ -1,114 +1,201 @@
 from PIL import Image, ImageDraw, ImageFont
-from typing import Dict, Any
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, BinaryIO, Dict, List, Tuple
 import io
+import os
+import threading
 
 
 def mm_to_pixels(mm: float, dpi: int = 300) -> int:
-    """Convert millimeters to pixels at given DPI"""
+    """Convert millimeters to pixels at given DPI (the renderers inline this per element)"""
     return int((mm / 25.4) * dpi)
 
 
-def get_font_for_type(font_type: str, size_mm: float, dpi: int = 300) -> ImageFont.FreeTypeFont:
+# Map font types to system fonts
+FONT_PATHS = {
+    'Script': ['/usr/share/fonts/truetype/liberation/LiberationSerif-Italic.ttf',
+               '/usr/share/fonts/truetype/dejavu/DejaVuSerif-Italic.ttf'],
+    'Serif': ['/usr/share/fonts/truetype/liberation/LiberationSerif-Regular.ttf',
+              '/usr/share/fonts/truetype/dejavu/DejaVuSerif.ttf'],
+    'Sans-Serif': ['/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
+                   '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf']
+}
+FALLBACK_FONT_PATH = '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+
+# Font files that exist on this system, resolved once so missing fonts aren't probed per element
+AVAILABLE_FONT_PATHS = {
+    font_type: [path for path in dict.fromkeys(paths + [FALLBACK_FONT_PATH]) if os.path.exists(path)]
+    for font_type, paths in FONT_PATHS.items()
+}
+
+
+@lru_cache(maxsize=128)
+def _load_font(font_type: str, size_px: int, basic_layout: bool = False) -> ImageFont.FreeTypeFont:
+    """Load (once per type, size and layout engine) the first available font for the given type"""
+    # BASIC layout skips Raqm/HarfBuzz text shaping (Pillow picks Raqm by default when installed)
+    layout_engine = ImageFont.Layout.BASIC if basic_layout else None
+    for font_path in AVAILABLE_FONT_PATHS.get(font_type, AVAILABLE_FONT_PATHS['Serif']):
+        try:
+            return ImageFont.truetype(font_path, size_px, layout_engine=layout_engine)
+        except:
+            continue
+    
+    # Ultimate fallback
+    return ImageFont.load_default()
+
+
+def get_font_for_type(
+    font_type: str,
+    size_pt: float,
+    dpi: int = 300,
+    basic_layout: bool = False
+) -> ImageFont.FreeTypeFont:
     """
     Get appropriate font for the given type.
     Falls back to default font if specific font not available.
+    
+    basic_layout selects Pillow's BASIC layout engine, which is enough for ASCII text
+    (names, dates) and skips complex-script shaping.
     """
     # Convert point size to pixels (1 pt = 1/72 inch)
-    size_px = int((size_mm / 25.4) * dpi * (1/72) * size_mm * 2)
-    
-    # Map font types to system fonts
-    font_paths = {
-        'Script': ['/usr/share/fonts/truetype/liberation/LiberationSerif-Italic.ttf',
-                   '/usr/share/fonts/truetype/dejavu/DejaVuSerif-Italic.ttf'],
-        'Serif': ['/usr/share/fonts/truetype/liberation/LiberationSerif-Regular.ttf',
-                  '/usr/share/fonts/truetype/dejavu/DejaVuSerif.ttf'],
-        'Sans-Serif': ['/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
-                       '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf']
-    }
-    
-    # Try to load the appropriate font
-    for font_path in font_paths.get(font_type, font_paths['Serif']):
-        try:
-            return ImageFont.truetype(font_path, size_px)
-        except:
-            continue
+    size_px = max(1, round(size_pt * dpi / 72))
     
-    # Ultimate fallback
+    return _load_font(font_type, size_px, basic_layout)
+
+
+# Common print sizes, loaded at import so the first card doesn't pay for opening the font files.
+# Only the ASCII (BASIC layout) variant is preloaded - names and dates are the usual card text.
+PRELOAD_FONT_SIZES_PT = (12, 16, 20, 24, 28, 32, 36, 40)
+
+
+def _preload_fonts() -> None:
+    """Warm the font cache; a failure only skips the warm-up and never breaks the import"""
     try:
-        return ImageFont.truetype('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', size_px)
-    except:
-        return ImageFont.load_default()
+        for font_type in FONT_PATHS:
+            for size_pt in PRELOAD_FONT_SIZES_PT:
+                get_font_for_type(font_type, size_pt, basic_layout=True)
+    except (OSError, ValueError) as e:
+        # Fonts are then loaded (or fall back) per element on first use
+        print(f"[FONTS] Font preload skipped: {str(e)}")
+
+
+_preload_fonts()
+
+
+# Transparent border around decorative tiles so strokes on the bounding box aren't clipped
+DECORATIVE_TILE_MARGIN_PX = 4
+
+# Resolution the decorative stroke widths, dot sizes and tile margin above are tuned for.
+# They scale with the render DPI so a lower-resolution preview keeps the print proportions.
+DECORATIVE_REFERENCE_DPI = 300
+
 
+def _scaled_px(px: int, dpi: float) -> int:
+    """Scale a pixel measure tuned for DECORATIVE_REFERENCE_DPI to the render DPI"""
+    return max(1, round(px * dpi / DECORATIVE_REFERENCE_DPI))
 
+
+# Encoder settings for render_card_to_bytes. Flat-color cards compress well even at zlib level 1,
+# which encodes several times faster than PNG's default level 6.
+SAVE_OPTIONS = {
+    'PNG': {'compress_level': 1, 'optimize': False},
+    'JPEG': {'quality': 90, 'optimize': False, 'progressive': False},
+}
+
+
+# Per-thread reusable card canvases for renders that are encoded immediately (see render_compiled)
+_IMAGE_POOL = threading.local()
+
+
+@lru_cache(maxsize=256)
 def hex_to_rgb(hex_color: str) -> tuple:
-    """Convert hex color to RGB tuple"""
-    hex_color = hex_color.lstrip('#')
-    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+    """Convert hex color to RGB tuple (cached, cards reuse a handful of colors)"""
+    return tuple(bytes.fromhex(hex_color.lstrip('#')))
 
 
-def render_text_element(
-    draw: ImageDraw.Draw, 
-    element: Dict[str, Any], 
-    dpi: int = 300
-) -> None:
-    """Render a text element on the card"""
+@dataclass(slots=True)
+class RenderOp:
+    """One resolved drawing operation: 'text' (xy, content, rgb, font) or 'paste' (tile, xy)"""
+    op: str
+    args: tuple
+
+
+@dataclass(slots=True)
+class CardPlan:
+    """A card design resolved to pixel sizes, colors, fonts and tiles for one DPI"""
+    size_px: Tuple[int, int]
+    background: tuple
+    ops: List[RenderOp]
+
+
+def compile_text_element(element: Dict[str, Any], dpi: int = 300) -> RenderOp:
+    """Resolve a text element to its pixel position, color and font"""
     content = element.get('content', '')
     font_type = element.get('font', 'Serif')
     font_size = element.get('fontSize', 16)
     color = element.get('color', '#000000')
     position = element.get('position', {'x': 0, 'y': 0})
     
-    x_px = mm_to_pixels(position['x'], dpi)
-    y_px = mm_to_pixels(position['y'], dpi)
+    px_per_mm = dpi / 25.4
+    x_px = int(position['x'] * px_per_mm)
+    y_px = int(position['y'] * px_per_mm)
     
-    font = get_font_for_type(font_type, font_size, dpi)
+    font = get_font_for_type(font_type, font_size, dpi, basic_layout=content.isascii())
     rgb_color = hex_to_rgb(color)
     
-    draw.text((x_px, y_px), content, fill=rgb_color, font=font)
+    return RenderOp('text', ((x_px, y_px), content, rgb_color, font))
 
 
-def render_decorative_element(
+def render_text_element(
     draw: ImageDraw.Draw, 
     element: Dict[str, Any], 
     dpi: int = 300
 ) -> None:
-    """Render a decorative element on the card"""
-    content = element.get('content', '')
-    position = element.get('position', {'x': 0, 'y': 0})
-    size = element.get('size', {'width': 10, 'height': 10})
-    color = element.get('color', '#000000')
-    
-    x_px = mm_to_pixels(position['x'], dpi)
-    y_px = mm_to_pixels(position['y'], dpi)
-    width_px = mm_to_pixels(size['width'], dpi)
-    height_px = mm_to_pixels(size['height'], dpi)
-    
-    rgb_color = hex_to_rgb(color)
+    """Render a text element on the card"""
+    xy, content, rgb_color, font = compile_text_element(element, dpi).args
+    draw.text(xy, content, fill=rgb_color, font=font)
+
+
+def draw_decorative_shape(
+    draw: ImageDraw.Draw,
+    content: str,
+    x_px: int,
+    y_px: int,
+    width_px: int,
+    height_px: int,
+    rgb_color: tuple,
+    dpi: int = 300
+) -> None:
+    """Draw a decorative shape with its bounding box at the given pixel position"""
+    stroke = _scaled_px(2, dpi)
     
     if content == 'heart-line':
         y_center = y_px + height_px // 2
-        draw.line([(x_px, y_center), (x_px + width_px, y_center)], fill=rgb_color, width=2)
+        draw.line([(x_px, y_center), (x_px + width_px, y_center)], fill=rgb_color, width=stroke)
         heart_size = height_px
         heart_x = x_px + width_px // 2 - heart_size // 2
         draw.ellipse(
             [heart_x, y_px, heart_x + heart_size, y_px + heart_size],
             outline=rgb_color,
-            width=2
+            width=stroke
         )
     
     elif content == 'floral-branch':
         # Draw elegant curved branch
         branch_x = x_px + width_px // 2
-        points = []
-        for i in range(10):
-            t = i / 9.0
-            curve_x = branch_x + int(width_px * 0.2 * (t - 0.5))
-            curve_y = y_px + int(height_px * t)
-            points.append((curve_x, curve_y))
+        points = [
+            (branch_x + int(width_px * 0.2 * (t - 0.5)), y_px + int(height_px * t))
+            for t in (i / 9.0 for i in range(10))
+        ]
+        
+        # Draw smooth branch curve as one polyline
+        draw.line(points, fill=rgb_color, width=_scaled_px(3, dpi), joint="curve")
         
-        # Draw smooth branch curve
-        for i in range(len(points) - 1):
-            draw.line([points[i], points[i + 1]], fill=rgb_color, width=3)
+        # Leaf shapes relative to their stem point, built once and translated to each leaf
+        leaf_dx, leaf_dy, leaf_base = int(width_px * 0.15), int(height_px * 0.04), int(width_px * 0.1)
+        left_leaf = ((0, 0), (-leaf_dx, -leaf_dy), (-leaf_base, 0))
+        right_leaf = ((0, 0), (leaf_dx, leaf_dy), (leaf_base, 0))
         
         # Draw leaves along the branch
         num_leaves = 5
@@ -117,27 +204,14 @@ def render_decorative_element(
             leaf_y = y_px + int(height_px * t)
             leaf_x = branch_x + int(width_px * 0.2 * (t - 0.5))
             
-            # Left leaf
-            left_pts = [
-                (leaf_x, leaf_y),
-                (leaf_x - int(width_px * 0.15), leaf_y - int(height_px * 0.04)),
-                (leaf_x - int(width_px * 0.1), leaf_y)
-            ]
-            draw.polygon(left_pts, fill=rgb_color)
-            
-            # Right leaf
-            right_pts = [
-                (leaf_x, leaf_y),
-                (leaf_x + int(width_px * 0.15), leaf_y + int(height_px * 0.04)),
-                (leaf_x + int(width_px * 0.1), leaf_y)
-            ]
-            draw.polygon(right_pts, fill=rgb_color)
+            for leaf in (left_leaf, right_leaf):
+                draw.polygon([(leaf_x + dx, leaf_y + dy) for dx, dy in leaf], fill=rgb_color)
     
     elif content == 'geometric-border':
         draw.rectangle(
             [x_px, y_px, x_px + width_px, y_px + height_px],
             outline=rgb_color,
-            width=2
+            width=stroke
         )
     
     elif content == 'leaf-accent':
@@ -147,70 +221,188 @@ def render_decorative_element(
             (x_px + width_px // 2, y_px + height_px),
             (x_px, y_px + height_px // 2)
         ]
-        draw.polygon(points, outline=rgb_color, width=2)
+        draw.polygon(points, outline=rgb_color, width=stroke)
     
     elif content == 'dots-pattern':
-        dot_size = 3
-        spacing = 10
-        for i in range(int(width_px // spacing)):
-            dot_x = x_px + i * spacing
+        dot_size = _scaled_px(3, dpi)
+        spacing = _scaled_px(10, dpi)
+        for dot_x in range(x_px, x_px + int(width_px // spacing) * spacing, spacing):
             draw.ellipse(
                 [dot_x, y_px, dot_x + dot_size, y_px + dot_size],
                 fill=rgb_color
             )
 
 
-def render_card_design(card_json: Dict[str, Any], dpi: int = 300) -> Image.Image:
+def _decorative_margin(width_px: int, height_px: int, dpi: int = 300) -> int:
+    """Tile margin covering stroke widths and the heart circle, which is wider than tall elements"""
+    return _scaled_px(DECORATIVE_TILE_MARGIN_PX, dpi) + max(0, height_px - width_px) // 2
+
+
+@lru_cache(maxsize=64)
+def _decorative_tile(content: str, width_px: int, height_px: int, rgb_color: tuple, dpi: int = 300) -> Image.Image:
+    """Render a decorative shape once per (style, size, color, DPI) onto a transparent tile"""
+    margin = _decorative_margin(width_px, height_px, dpi)
+    tile = Image.new('RGBA', (width_px + 2 * margin + 1, height_px + 2 * margin + 1), (0, 0, 0, 0))
+    draw_decorative_shape(ImageDraw.Draw(tile), content, margin, margin, width_px, height_px, rgb_color, dpi)
+    return tile
+
+
+def compile_decorative_element(element: Dict[str, Any], dpi: int = 300) -> RenderOp:
+    """Resolve a decorative element to its cached tile and paste position"""
+    content = element.get('content', '')
+    position = element.get('position', {'x': 0, 'y': 0})
+    size = element.get('size', {'width': 10, 'height': 10})
+    color = element.get('color', '#000000')
+    
+    px_per_mm = dpi / 25.4
+    x_px = int(position['x'] * px_per_mm)
+    y_px = int(position['y'] * px_per_mm)
+    width_px = int(size['width'] * px_per_mm)
+    height_px = int(size['height'] * px_per_mm)
+    
+    rgb_color = hex_to_rgb(color)
+    
+    tile = _decorative_tile(content, width_px, height_px, rgb_color, dpi)
+    margin = _decorative_margin(width_px, height_px, dpi)
+    return RenderOp('paste', (tile, (x_px - margin, y_px - margin)))
+
+
+def render_decorative_element(
+    image: Image.Image, 
+    element: Dict[str, Any], 
+    dpi: int = 300
+) -> None:
+    """Render a decorative element on the card by pasting its cached tile"""
+    tile, xy = compile_decorative_element(element, dpi).args
+    image.paste(tile, xy, tile)
+
+
+def compile_card_plan(card_json: Dict[str, Any], dpi: int = 300) -> CardPlan:
     """
-    Render a card design JSON to a PIL Image.
+    Resolve a card design once into drawing operations that render_compiled can replay.
     
     Args:
         card_json: Card design as dictionary
         dpi: Dots per inch for rendering (default: 300)
     
     Returns:
-        PIL Image of the rendered card
+        CardPlan with the card size, background color and one operation per drawable element
     """
     card_info = card_json.get('card', {})
     width_mm = card_info.get('width', 148)
     height_mm = card_info.get('height', 105)
     bg_color = card_info.get('backgroundColor', '#FFFFFF')
     
-    width_px = mm_to_pixels(width_mm, dpi)
-    height_px = mm_to_pixels(height_mm, dpi)
-    
-    bg_rgb = hex_to_rgb(bg_color)
+    px_per_mm = dpi / 25.4
+    width_px = int(width_mm * px_per_mm)
+    height_px = int(height_mm * px_per_mm)
     
-    image = Image.new('RGB', (width_px, height_px), bg_rgb)
-    draw = ImageDraw.Draw(image)
-    
-    elements = card_json.get('elements', [])
-    for element in elements:
+    ops = []
+    for element in card_json.get('elements', []):
         elem_type = element.get('type')
         
         if elem_type == 'text':
-            render_text_element(draw, element, dpi)
+            ops.append(compile_text_element(element, dpi))
         elif elem_type == 'decorative':
-            render_decorative_element(draw, element, dpi)
+            ops.append(compile_decorative_element(element, dpi))
+    
+    return CardPlan((width_px, height_px), hex_to_rgb(bg_color), ops)
+
+
+def _pooled_card_image(size_px: Tuple[int, int], background: tuple) -> Image.Image:
+    """
+    Get this thread's reusable card canvas, cleared to the background color.
     
+    Only for renders that are encoded and discarded right away: the next pooled render
+    on the same thread draws over the returned image.
+    """
+    image = getattr(_IMAGE_POOL, 'image', None)
+    if image is None or image.size != size_px:
+        image = Image.new('RGB', size_px, background)
+        _IMAGE_POOL.image = image
+    else:
+        image.paste(background, (0, 0) + size_px)
     return image
 
 
-def render_card_to_bytes(card_json: Dict[str, Any], format: str = 'PNG') -> bytes:
+def render_compiled(plan: CardPlan, pooled: bool = False) -> Image.Image:
+    """
+    Render a compiled card plan to a PIL Image.
+    
+    Useful when the same plan is rendered many times; all parsing, font loading and
+    decorative tile drawing already happened in compile_card_plan.
+    
+    Args:
+        plan: Plan returned by compile_card_plan
+        pooled: Draw on this thread's reusable canvas instead of a new image. The result
+            is overwritten by the next pooled render, so only use it for immediate encoding.
+    
+    Returns:
+        PIL Image of the rendered card
+    """
+    if pooled:
+        image = _pooled_card_image(plan.size_px, plan.background)
+    else:
+        image = Image.new('RGB', plan.size_px, plan.background)
+    draw = ImageDraw.Draw(image)
+    
+    for render_op in plan.ops:
+        if render_op.op == 'text':
+            xy, content, rgb_color, font = render_op.args
+            draw.text(xy, content, fill=rgb_color, font=font)
+        else:
+            tile, xy = render_op.args
+            image.paste(tile, xy, tile)
+    
+    return image
+
+
+def render_card_design(card_json: Dict[str, Any], dpi: int = 300) -> Image.Image:
+    """
+    Render a card design JSON to a PIL Image.
+    
+    Args:
+        card_json: Card design as dictionary
+        dpi: Dots per inch for rendering (default: 300)
+    
+    Returns:
+        PIL Image of the rendered card
+    """
+    return render_compiled(compile_card_plan(card_json, dpi))
+
+
+def render_card_to_stream(
+    card_json: Dict[str, Any],
+    out_stream: BinaryIO,
+    format: str = 'PNG',
+    dpi: int = 300
+) -> None:
+    """
+    Render card design straight into a writable binary stream (file, HTTP response, ...).
+    
+    Args:
+        card_json: Card design as dictionary
+        out_stream: Binary stream the encoded image is written to
+        format: Image format (PNG, JPEG, etc.)
+        dpi: Dots per inch for rendering (default: 300)
+    """
+    # The image is encoded right away, so the thread's pooled canvas can be reused
+    image = render_compiled(compile_card_plan(card_json, dpi), pooled=True)
+    image.save(out_stream, format=format, **SAVE_OPTIONS.get(format.upper(), {}))
+
+
+def render_card_to_bytes(card_json: Dict[str, Any], format: str = 'PNG', dpi: int = 300) -> bytes:
     """
     Render card design to image bytes.
     
     Args:
         card_json: Card design as dictionary
         format: Image format (PNG, JPEG, etc.)
+        dpi: Dots per inch for rendering (default: 300)
     
     Returns:
         Image bytes
     """
-    image = render_card_design(card_json)
-    
     img_bytes = io.BytesIO()
-    image.save(img_bytes, format=format)
-    img_bytes.seek(0)
-    
+    render_card_to_stream(card_json, img_bytes, format, dpi)
     return img_bytes.getvalue()
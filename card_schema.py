@@ -1,4 +1,4 @@
-from typing import Dict, Any, List, Optional, Union
+from typing import Annotated, Dict, Any, List, Literal, Optional, Union
 from pydantic import BaseModel, Field, field_validator
 
 
@@ -23,9 +23,9 @@ class CardDimensions(BaseModel):
 
 class TextElement(BaseModel):
     """Text element on the card"""
-    type: str = Field("text", pattern=r'^text$')
+    type: Literal['text'] = 'text'
     content: str = Field(..., min_length=1, max_length=200)
-    font: str = Field(..., pattern=r'^(Serif|Sans-Serif|Script)$')
+    font: Literal['Serif', 'Sans-Serif', 'Script']
     fontSize: int = Field(..., ge=12, le=40, description="Font size in points (12-40 for readability)")
     color: str = Field(..., pattern=r'^#[0-9A-Fa-f]{6}$')
     position: Position
@@ -33,11 +33,8 @@ class TextElement(BaseModel):
 
 class DecorativeElement(BaseModel):
     """Decorative element on the card"""
-    type: str = Field("decorative", pattern=r'^decorative$')
-    content: str = Field(
-        ..., 
-        pattern=r'^(floral-branch|heart-line|geometric-border|leaf-accent|dots-pattern)$'
-    )
+    type: Literal['decorative'] = 'decorative'
+    content: Literal['floral-branch', 'heart-line', 'geometric-border', 'leaf-accent', 'dots-pattern']
     position: Position
     size: Size
     color: str = Field(..., pattern=r'^#[0-9A-Fa-f]{6}$')
@@ -45,16 +42,20 @@ class DecorativeElement(BaseModel):
 
 class ImageElement(BaseModel):
     """Image element on the card (legacy support)"""
-    type: str = Field("image", pattern=r'^image$')
+    type: Literal['image'] = 'image'
     src: str
     position: Position
     size: Size
 
 
+# Elements are dispatched on their "type" tag, so each is validated against one model only
+CardElement = Annotated[Union[TextElement, DecorativeElement, ImageElement], Field(discriminator='type')]
+
+
 class CardDesign(BaseModel):
     """Complete wedding card design schema with enforced element validation"""
     card: CardDimensions
-    elements: List[Union[TextElement, DecorativeElement, ImageElement]] = Field(..., min_length=1, max_length=10)
+    elements: List[CardElement] = Field(..., min_length=1, max_length=10)
     
     @field_validator('elements')
     @classmethod
@@ -63,8 +64,8 @@ class CardDesign(BaseModel):
         if not v:
             raise ValueError("Card must have at least one element")
         
-        text_count = sum(1 for el in v if isinstance(el, (dict, TextElement)) and (el.get('type') if isinstance(el, dict) else el.type) == 'text')
-        decorative_count = sum(1 for el in v if isinstance(el, (dict, DecorativeElement)) and (el.get('type') if isinstance(el, dict) else el.type) == 'decorative')
+        text_count = sum(1 for el in v if el.type == 'text')
+        decorative_count = sum(1 for el in v if el.type == 'decorative')
         
         if text_count < 2:
             raise ValueError("Card must have at least 2 text elements")
@@ -76,6 +77,34 @@ class CardDesign(BaseModel):
         return v
 
 
+class SizeSpec(BaseModel):
+    """Size in millimeters (response schema variant - Gemini schemas don't support exclusive bounds)"""
+    width: float = Field(..., ge=1, le=100)
+    height: float = Field(..., ge=1, le=100)
+
+
+class ElementSpec(BaseModel):
+    """Card element in the flat shape used for Gemini structured output"""
+    type: Literal['text', 'decorative']
+    content: str
+    font: Optional[Literal['Serif', 'Sans-Serif', 'Script']] = None
+    fontSize: Optional[int] = Field(None, ge=12, le=40)
+    color: str = Field(..., pattern=r'^#[0-9A-Fa-f]{6}$')
+    position: Position
+    size: Optional[SizeSpec] = None
+
+
+class CardSpec(BaseModel):
+    """
+    Response schema for AI card design generation.
+    
+    Mirrors CardDesign using only constraints Gemini's response_schema can express
+    (no element union or custom validators); generated designs are still checked
+    with validate_card_design before use.
+    """
+    card: CardDimensions
+    elements: List[ElementSpec] = Field(..., min_length=1, max_length=10)
+
 def validate_card_design(card_json: Dict[str, Any]) -> bool:
     """
     Validate a card design JSON against the schema with full field-level enforcement.
@@ -93,28 +122,8 @@ def validate_card_design(card_json: Dict[str, Any]) -> bool:
         # Remove internal metadata fields before validation
         clean_json = {k: v for k, v in card_json.items() if not k.startswith('_')}
         
-        # Parse and validate each element individually to enforce field constraints
-        validated_elements = []
-        elements = clean_json.get('elements', [])
-        
-        for i, element in enumerate(elements):
-            elem_type = element.get('type')
-            
-            if elem_type == 'text':
-                validated_elements.append(TextElement(**element))
-            elif elem_type == 'decorative':
-                validated_elements.append(DecorativeElement(**element))
-            elif elem_type == 'image':
-                validated_elements.append(ImageElement(**element))
-            else:
-                raise ValueError(f"Unknown element type at index {i}: {elem_type}")
-        
-        # Now validate the complete card design with parsed elements
-        card_data = {
-            'card': clean_json.get('card'),
-            'elements': validated_elements
-        }
-        CardDesign(**card_data)
+        # Validate the complete card design; the tagged union validates each element once
+        CardDesign.model_validate(clean_json)
         
         return True
         
@@ -4,16 +4,61 @@ Uses OAuth 2.0 authentication with Pinterest API v5.
 """
 
 import os
+import threading
+from functools import lru_cache
 import requests
+from cachetools import TTLCache
 from typing import List, Dict, Optional
 from urllib.parse import urlparse, quote
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Board pins fetched in the last 10 minutes, shared by all clients in the process (PinterestAPI
+# instances are short-lived). Keyed by access token too, since visibility depends on the account.
+BOARD_PINS_CACHE_TTL_SECONDS = 600
+_board_pins_cache = TTLCache(maxsize=128, ttl=BOARD_PINS_CACHE_TTL_SECONDS)
+_board_pins_cache_lock = threading.Lock()
+
 
 class PinterestAPIError(Exception):
     """Custom exception for Pinterest API errors"""
     pass
 
 
+def _parse_json_response(response: requests.Response) -> Dict:
+    """Parse a JSON response body with orjson when it is installed, else requests' stdlib parser"""
+    if orjson is None:
+        return response.json()
+    try:
+        return orjson.loads(response.content)
+    except orjson.JSONDecodeError as e:
+        raise PinterestAPIError(f"Invalid JSON response from Pinterest API: {str(e)}")
+
+
+@lru_cache(maxsize=256)
+def _parse_board_id(board_url: str) -> str:
+    """Parse "username/board_name" from a board URL (see PinterestAPI.parse_board_id_from_url)"""
+    # Example URL: https://www.pinterest.com/username/board-name/
+    parsed = urlparse(board_url)
+    path_parts = [p for p in parsed.path.split('/') if p]
+    
+    if len(path_parts) < 2:
+        raise PinterestAPIError(
+            f"Invalid Pinterest board URL format. Expected format: "
+            f"https://pinterest.com/username/board-name/"
+        )
+    
+    # Board ID is username/board_name
+    username = path_parts[0]
+    board_name = path_parts[1]
+    
+    return f"{username}/{board_name}"
+
+
 class PinterestAPI:
     """
     Pinterest API v5 client for fetching board pins and images.
@@ -32,6 +77,9 @@ class PinterestAPI:
         
         self.base_url = "https://api.pinterest.com/v5"
         self.access_token: Optional[str] = None
+        
+        # One session per client so paginated requests reuse the same keep-alive connection
+        self.session = requests.Session()
     
     def get_oauth_url(self, redirect_uri: str, state: str = "random_state") -> str:
         """
@@ -81,11 +129,11 @@ class PinterestAPI:
         }
         
         try:
-            response = requests.post(token_url, data=data, headers=headers, timeout=10)
+            response = self.session.post(token_url, data=data, headers=headers, timeout=10)
             response.raise_for_status()
             
-            token_data = response.json()
-            self.access_token = token_data['access_token']
+            token_data = _parse_json_response(response)
+            self.set_access_token(token_data['access_token'])
             return self.access_token
             
         except requests.RequestException as e:
@@ -94,6 +142,7 @@ class PinterestAPI:
     def set_access_token(self, token: str):
         """Set the access token manually (for stored tokens)"""
         self.access_token = token
+        self.session.headers['Authorization'] = f'Bearer {token}'
     
     def parse_board_id_from_url(self, board_url: str) -> str:
         """
@@ -105,21 +154,7 @@ class PinterestAPI:
         Returns:
             Board ID in format "username/board_name"
         """
-        # Example URL: https://www.pinterest.com/username/board-name/
-        parsed = urlparse(board_url)
-        path_parts = [p for p in parsed.path.split('/') if p]
-        
-        if len(path_parts) < 2:
-            raise PinterestAPIError(
-                f"Invalid Pinterest board URL format. Expected format: "
-                f"https://pinterest.com/username/board-name/"
-            )
-        
-        # Board ID is username/board_name
-        username = path_parts[0]
-        board_name = path_parts[1]
-        
-        return f"{username}/{board_name}"
+        return _parse_board_id(board_url)
     
     def get_board_pins(self, board_id: str, page_size: int = 100) -> List[Dict]:
         """
@@ -137,12 +172,13 @@ class PinterestAPI:
                 "Access token not set. Please authenticate first using OAuth flow."
             )
         
-        endpoint = f"{self.base_url}/boards/{board_id}/pins/"
+        cache_key = (self.access_token, board_id, page_size)
+        with _board_pins_cache_lock:
+            cached_pins = _board_pins_cache.get(cache_key)
+        if cached_pins is not None:
+            return list(cached_pins)
         
-        headers = {
-            'Authorization': f'Bearer {self.access_token}',
-            'Content-Type': 'application/json'
-        }
+        endpoint = f"{self.base_url}/boards/{board_id}/pins/"
         
         params = {
             'page_size': min(page_size, 100)
@@ -156,7 +192,7 @@ class PinterestAPI:
                 if bookmark:
                     params['bookmark'] = bookmark
                 
-                response = requests.get(endpoint, headers=headers, params=params, timeout=15)
+                response = self.session.get(endpoint, params=params, timeout=15)
                 
                 # Handle specific error cases
                 if response.status_code == 401:
@@ -176,7 +212,7 @@ class PinterestAPI:
                 
                 response.raise_for_status()
                 
-                data = response.json()
+                data = _parse_json_response(response)
                 items = data.get('items', [])
                 all_pins.extend(items)
                 
@@ -185,7 +221,10 @@ class PinterestAPI:
                 if not bookmark or len(all_pins) >= page_size:
                     break
             
-            return all_pins[:page_size]
+            pins = all_pins[:page_size]
+            with _board_pins_cache_lock:
+                _board_pins_cache[cache_key] = pins
+            return list(pins)
             
         except requests.RequestException as e:
             raise PinterestAPIError(f"Failed to fetch board pins: {str(e)}")
@@ -199,9 +238,10 @@ class PinterestAPI:
             quality: Image quality to extract ('original', '1200x', '600x', '400x300', '150x150')
         
         Returns:
-            List of image URLs
+            List of unique image URLs, in pin order
         """
         image_urls = []
+        seen_urls = set()
         
         for pin in pins:
             try:
@@ -212,7 +252,8 @@ class PinterestAPI:
                 # Try to get requested quality, fallback to original
                 image_data = images.get(quality) or images.get('original')
                 
-                if image_data and 'url' in image_data:
+                if image_data and 'url' in image_data and image_data['url'] not in seen_urls:
+                    seen_urls.add(image_data['url'])
                     image_urls.append(image_data['url'])
                     
             except (KeyError, TypeError):
@@ -1,11 +1,67 @@
+import re
 import requests
-from bs4 import BeautifulSoup
-from typing import List
-import time
+from functools import lru_cache
+from bs4 import BeautifulSoup, SoupStrainer
+from typing import List, Optional
+from urllib.parse import urlparse
 
 # Minimum number of images required for meaningful aesthetic analysis
 MIN_REQUIRED_IMAGES = 5
 
+# Shared session so repeated board fetches reuse pooled connections
+_SESSION = requests.Session()
+
+# Tags kept when parsing a board page
+PAGE_TAGS = SoupStrainer(['meta', 'img', 'script'])
+
+# Pinterest CDN image URLs embedded in the page's JSON scripts. The path is length-bounded and
+# stops at markup characters so malformed pages can't produce runaway matches.
+PINIMG_URL_PATTERN = re.compile(r'https://i\.pinimg\.com/[^"\'}<>\s]{1,512}')
+
+# Downscaled Pinterest CDN sizes that are rewritten to the original image
+THUMBNAIL_SIZE_PATTERN = re.compile(r'/(?:236x|474x|564x)/')
+
+# Sizes of script-embedded image URLs worth keeping (smaller ones are usually avatars and icons)
+SCRIPT_IMAGE_SIZE_PATTERN = re.compile(r'/(?:originals|736x|564x)/')
+
+# Board page paths: /{username}/{board-name}/ (with optional trailing slash)
+BOARD_PATH_PATTERN = re.compile(r'^/[^/]+/[^/]+/?$')
+
+# Allowlist of legitimate Pinterest TLDs to prevent SSRF attacks
+# Includes both single-label (com, de) and multi-label TLDs (com.au, co.uk, co.kr)
+ALLOWED_PINTEREST_TLDS = frozenset([
+    # Single-label TLDs
+    'com', 'ca', 'de', 'fr', 'es', 'it', 'jp', 'ru', 'br', 'at', 'ch',
+    'cl', 'cz', 'dk', 'fi', 'hk', 'hu', 'id', 'ie', 'in', 'nl', 'no',
+    'nz', 'ph', 'pl', 'pt', 'ro', 'se', 'sg', 'th', 'tw', 'vn', 'za',
+    'ae', 'be', 'gr', 'kr',
+    # Multi-label TLDs
+    'com.au', 'com.mx', 'com.br', 'co.uk', 'co.kr', 'co.jp', 'co.nz',
+    'co.in', 'co.za', 'com.ar', 'com.co', 'com.ec', 'com.pe', 'com.ph',
+    'com.sg', 'com.tw', 'com.vn', 'com.hk'
+])
+
+# Board hostnames: pinterest.{tld}, optionally prefixed by 'www' or a 2-3 letter locale code
+# (more subdomain levels are rejected to prevent SSRF). Group 1 is the TLD.
+PINTEREST_HOST_PATTERN = re.compile(r'^(?:www\.|[a-z]{2,3}\.)?pinterest\.([a-z.]+)$')
+
+# Length bounds of a plausible board URL (the shortest is e.g. http://pinterest.ca/a/b)
+MIN_BOARD_URL_LENGTH = 20
+MAX_BOARD_URL_LENGTH = 2048
+
+# Substrings of Pinterest URLs that are never boards (search results, pins, idea pages, queries)
+NON_BOARD_URL_PATTERNS = ('/search/', '/pin/', '/ideas/', '?')
+
+
+def _upgrade_to_original(url: str) -> str:
+    """Rewrite a Pinterest thumbnail URL to the original-resolution image"""
+    return THUMBNAIL_SIZE_PATTERN.sub('/originals/', url)
+
+
+def _is_pinterest_image_url(url: Optional[str]) -> bool:
+    """Check that a scraped URL is an absolute Pinterest (or Pinterest CDN) URL"""
+    return bool(url) and url.startswith('http') and ('pinimg.com' in url or 'pinterest.com' in url)
+
 
 def extract_pinterest_images(board_url: str, max_images: int = 30) -> List[str]:
     """
@@ -32,68 +88,61 @@ def extract_pinterest_images(board_url: str, max_images: int = 30) -> List[str]:
     }
     
     try:
-        response = requests.get(board_url, headers=headers, timeout=10)
+        response = _SESSION.get(board_url, headers=headers, timeout=10)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.content, 'html.parser')
+        # Only meta, img and script tags are read, so skip building the rest of the (large) page tree
+        soup = BeautifulSoup(response.content, 'lxml', parse_only=PAGE_TAGS)
         
+        # Collect validated, unique URLs in a single pass over meta and img tags (document order,
+        # so og:image meta tags in the head come first)
         image_urls = []
-        
-        # Try to find images in meta tags first
-        meta_images = soup.find_all('meta', property='og:image')
-        for meta in meta_images[:max_images]:
-            img_url = meta.get('content')
-            if img_url and img_url not in image_urls:
-                image_urls.append(img_url)
-        
-        # Try to find images in img tags
-        img_tags = soup.find_all('img')
-        for img in img_tags:
-            src = img.get('src') or img.get('data-src')
-            if not src:
-                srcset = img.get('srcset')
-                if srcset and isinstance(srcset, str):
-                    src = srcset.split(',')[0].split(' ')[0]
+        seen_urls = set()
+        for tag in soup.find_all(['meta', 'img']):
+            if tag.name == 'meta':
+                if tag.get('property') != 'og:image':
+                    continue
+                src = tag.get('content')
+            else:
+                src = tag.get('src') or tag.get('data-src')
+                if not src:
+                    srcset = tag.get('srcset')
+                    if srcset:
+                        src = srcset.split(',')[0].split(' ')[0]
             
-            if src and isinstance(src, str) and ('pinimg.com' in src or 'pinterest.com' in src):
+            # One validity check per candidate; the size rewrite below doesn't change the outcome
+            if not _is_pinterest_image_url(src):
+                continue
+            if tag.name == 'img':
                 # Get the highest quality version
-                if '/236x/' in src:
-                    src = src.replace('/236x/', '/originals/')
-                elif '/474x/' in src:
-                    src = src.replace('/474x/', '/originals/')
-                elif '/564x/' in src:
-                    src = src.replace('/564x/', '/originals/')
-                    
-                if src not in image_urls:
-                    image_urls.append(src)
-                    
-            if len(image_urls) >= max_images:
-                break
+                src = _upgrade_to_original(src)
+            
+            if src not in seen_urls:
+                seen_urls.add(src)
+                image_urls.append(src)
+                if len(image_urls) >= max_images:
+                    break
         
         # Try extracting from page scripts
-        if len(image_urls) < 5:
-            import re
-            script_tags = soup.find_all('script')
-            for script in script_tags:
+        if len(image_urls) < min(5, max_images):
+            for script in soup.find_all('script'):
                 script_content = script.string
-                if script_content and 'pinimg.com' in script_content:
-                    pattern = r'https://i\.pinimg\.com/[^"\'}\s]+'
-                    found_urls = re.findall(pattern, script_content)
-                    for url in found_urls:
-                        if '/originals/' in url or '/736x/' in url or '/564x/' in url:
-                            clean_url = url.replace('/236x/', '/originals/').replace('/474x/', '/originals/').replace('/564x/', '/originals/')
-                            if clean_url not in image_urls:
-                                image_urls.append(clean_url)
-                                if len(image_urls) >= max_images:
-                                    break
+                if not script_content or 'pinimg.com' not in script_content:
+                    continue
+                # finditer scans lazily, so the rest of a large script is skipped once enough URLs are found
+                for match in PINIMG_URL_PATTERN.finditer(script_content):
+                    url = match.group()
+                    if SCRIPT_IMAGE_SIZE_PATTERN.search(url):
+                        clean_url = _upgrade_to_original(url)
+                        if clean_url not in seen_urls:
+                            seen_urls.add(clean_url)
+                            image_urls.append(clean_url)
+                            if len(image_urls) >= max_images:
+                                break
+                if len(image_urls) >= max_images:
+                    break
         
-        # Clean and validate URLs
-        validated_urls = []
-        for url in image_urls[:max_images]:
-            if url.startswith('http') and ('pinimg.com' in url or 'pinterest.com' in url):
-                validated_urls.append(url)
-        
-        return validated_urls
+        return image_urls
     
     except requests.RequestException as e:
         raise Exception(
@@ -121,27 +170,26 @@ def validate_pinterest_url(url: str) -> bool:
     if not url:
         return False
     
-    # Normalize: strip whitespace and ensure https
-    url = url.strip()
+    # Normalize before the cached check so whitespace variants share one cache entry
+    return _is_valid_board_url(url.strip())
+
+
+@lru_cache(maxsize=512)
+def _is_valid_board_url(url: str) -> bool:
+    """Validate a stripped board URL (validate_pinterest_url without normalization, memoized)"""
+    # Must be an http(s) URL
     if not url.startswith('http'):
         return False
     
-    import re
-    from urllib.parse import urlparse
+    # Cheap checks first so obviously invalid URLs never reach urlparse
+    if not MIN_BOARD_URL_LENGTH <= len(url) <= MAX_BOARD_URL_LENGTH:
+        return False
+    if 'pinterest.' not in url.lower():
+        return False
     
-    # Allowlist of legitimate Pinterest TLDs to prevent SSRF attacks
-    # Includes both single-label (com, de) and multi-label TLDs (com.au, co.uk, co.kr)
-    allowed_tlds = [
-        # Single-label TLDs
-        'com', 'ca', 'de', 'fr', 'es', 'it', 'jp', 'ru', 'br', 'at', 'ch',
-        'cl', 'cz', 'dk', 'fi', 'hk', 'hu', 'id', 'ie', 'in', 'nl', 'no',
-        'nz', 'ph', 'pl', 'pt', 'ro', 'se', 'sg', 'th', 'tw', 'vn', 'za',
-        'ae', 'be', 'gr', 'kr',
-        # Multi-label TLDs
-        'com.au', 'com.mx', 'com.br', 'co.uk', 'co.kr', 'co.jp', 'co.nz',
-        'co.in', 'co.za', 'com.ar', 'com.co', 'com.ec', 'com.pe', 'com.ph',
-        'com.sg', 'com.tw', 'com.vn', 'com.hk'
-    ]
+    # Reject obvious non-board paths
+    if any(pattern in url for pattern in NON_BOARD_URL_PATTERNS):
+        return False
     
     # Parse URL to extract components
     parsed = urlparse(url)
@@ -160,46 +208,13 @@ def validate_pinterest_url(url: str) -> bool:
     # Reject:
     # - pinterest.attacker.com (not in TLD allowlist)
     # - evil.subdomain.pinterest.com (too many levels)
-    parts = hostname.split('.')
-    
-    # Check if hostname contains 'pinterest'
-    pinterest_found = False
-    tld = None
-    
-    for i, part in enumerate(parts):
-        if part == 'pinterest':
-            # Extract TLD after 'pinterest'
-            tld = '.'.join(parts[i+1:])
-            if tld in allowed_tlds:
-                pinterest_found = True
-                # Validate prefix structure (if any)
-                # Allow: no prefix, 'www', or 2-3 letter locale codes (matching ISO country codes)
-                if i == 0:
-                    # Direct pinterest.{tld} - valid
-                    pass
-                elif i == 1:
-                    # Single prefix: {locale}.pinterest.{tld}
-                    locale = parts[0]
-                    # Allow 'www' or 2-3 letter locale codes (ISO country codes)
-                    if not (locale == 'www' or (len(locale) in [2, 3] and locale.isalpha())):
-                        return False
-                else:
-                    # Too many subdomain levels - reject to prevent SSRF
-                    return False
-            break
-    
-    if not pinterest_found or not tld:
+    host_match = PINTEREST_HOST_PATTERN.match(hostname)
+    if not host_match or host_match.group(1) not in ALLOWED_PINTEREST_TLDS:
         return False
     
     # Validate path structure: /{username}/{board-name}/ (with optional trailing slash)
     # Reject search URLs, pin URLs, query strings
-    path_pattern = r'^/[^/]+/[^/]+/?$'
-    if not re.match(path_pattern, path):
-        return False
-    
-    # Reject obvious non-board paths
-    reject_patterns = ['/search/', '/pin/', '/ideas/', '?']
-    if any(pattern in url for pattern in reject_patterns):
+    if not BOARD_PATH_PATTERN.match(path):
         return False
     
     return True
@@ -0,0 +1,120 @@
+"""
+Persistent response cache for external API calls (Gemini responses, Apify board scrapes).
+Stores responses in a local SQLite database keyed by SHA-256 hashes of their inputs, so
+repeated inputs (popular pins, re-submitted boards) skip the API call entirely - across
+Streamlit sessions and app restarts. Each lookup can use its own time-to-live.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+
+DEFAULT_CACHE_PATH = Path(".response_cache") / "responses.sqlite3"
+DEFAULT_TTL_SECONDS = 24 * 60 * 60  # 24 hours
+
+
+def make_cache_key(*parts: str) -> str:
+    """
+    Build a stable SHA-256 cache key from one or more input strings.
+
+    Args:
+        parts: Input strings (e.g. model name, prompt, image URL)
+
+    Returns:
+        Hex digest identifying the inputs
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')  # Separator so ("ab", "c") and ("a", "bc") don't collide
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    Thread-safe SQLite-backed key/value cache with a time-to-live.
+
+    Entries are grouped by namespace (e.g. "image_description", "design_brief") so
+    different pipeline steps never share keys. Cache failures are logged and treated
+    as misses - a broken cache never breaks the pipeline.
+    """
+
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH, ttl_seconds: int = DEFAULT_TTL_SECONDS):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "namespace TEXT NOT NULL, "
+                "key TEXT NOT NULL, "
+                "value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+
+    def get(self, namespace: str, key: str, ttl_seconds: Optional[int] = None) -> Optional[str]:
+        """Return the cached value, or None if missing or older than ttl_seconds (default: the cache TTL)"""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value, created_at FROM responses WHERE namespace = ? AND key = ?",
+                    (namespace, key)
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"[CACHE] Response cache read failed: {str(e)}")
+            return None
+
+        if row is None:
+            return None
+
+        value, created_at = row
+        if time.time() - created_at > (self.ttl_seconds if ttl_seconds is None else ttl_seconds):
+            return None
+        return value
+
+    def set(self, namespace: str, key: str, value: str) -> None:
+        """Store a value, replacing any existing entry"""
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (namespace, key, value, created_at) VALUES (?, ?, ?, ?)",
+                    (namespace, key, value, time.time())
+                )
+        except sqlite3.Error as e:
+            print(f"[CACHE] Response cache write failed: {str(e)}")
+
+
+class NullResponseCache:
+    """Cache that stores nothing, used when the response cache database can't be opened"""
+
+    def get(self, namespace: str, key: str, ttl_seconds: Optional[int] = None) -> Optional[str]:
+        return None
+
+    def set(self, namespace: str, key: str, value: str) -> None:
+        pass
+
+
+@lru_cache(maxsize=1)
+def get_response_cache() -> ResponseCache:
+    """
+    Get the process-wide response cache (created lazily on first use).
+
+    Falls back to a NullResponseCache if the cache directory or database can't be
+    created (e.g. a read-only or locked directory), so caching is disabled instead of
+    breaking the pipeline.
+    """
+    try:
+        return ResponseCache()
+    except (OSError, sqlite3.Error) as e:
+        print(f"[CACHE] Response cache unavailable, caching disabled: {str(e)}")
+        return NullResponseCache()
+
@@ -0,0 +1,60 @@
+"""Streaming card design JSON checks (run with pytest, or directly as a script)"""
+import importlib
+import sys
+
+import pytest
+
+
+@pytest.fixture
+def tracker(monkeypatch):
+    # ai_card_generator creates its Gemini client at import time, which needs an API key
+    monkeypatch.setenv("AI_INTEGRATIONS_GEMINI_API_KEY", "test-key")
+    return importlib.import_module("ai_card_generator")._CardJsonStreamTracker()
+
+
+VALID_STREAM = [
+    '{"card": {"width": 148, "height": 105, "backgroundColor": "#F5F3F0"}, ',
+    '"elements": [{"type": "text", "content": "Anna & Markus {}", ',
+    '"position": {"x": 10, "y": 40}}, {"type": "deco',
+    'rative", "content": "heart-line", "note": "quote \\" ]"}]}',
+]
+
+
+def test_valid_stream(tracker):
+    for chunk in VALID_STREAM:
+        tracker.feed(chunk)
+
+
+def test_completed_element_count(tracker):
+    counts = []
+    for chunk in VALID_STREAM:
+        tracker.feed(chunk)
+        counts.append(tracker.completed_elements)
+    # Nested objects and braces inside strings don't count, only closed "elements" entries
+    assert counts == [0, 0, 1, 2]
+
+
+@pytest.mark.parametrize("text", [
+    pytest.param('{"elements": [{"type": "text"]}', id="mismatched_bracket"),
+    pytest.param('{"card": {}}}', id="extra_closing_bracket"),
+    pytest.param('["not", "an", "object"]', id="not_an_object"),
+])
+def test_unbalanced_bracket_rejected(tracker, text):
+    with pytest.raises(ValueError):
+        tracker.feed(text)
+
+
+def test_unterminated_string_swallows_structure(tracker):
+    # Inside an open string brackets are content, so the object never closes and
+    # anything after what should have been its end is not flagged yet
+    tracker.feed('{"content": "Anna & Markus}]')
+    tracker.feed('}')
+    assert tracker.completed_elements == 0
+    # Closing the string and the object makes any further data invalid
+    tracker.feed('"}')
+    with pytest.raises(ValueError, match="after the end"):
+        tracker.feed('{')
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -1,22 +1,33 @@
 #!/usr/bin/env python3
-"""Quick test script to debug image analysis"""
+"""Quick test to debug image analysis (needs Gemini credentials and network access)"""
 
+import asyncio
+import os
 import sys
-sys.path.insert(0, '.')
 
-from ai_card_generator import analyze_single_image
+import pytest
+
+sys.path.insert(0, '.')
 
 # Test with one of the failing Pinterest images
 test_url = "https://i.pinimg.com/originals/8f/5e/5a/8f5e5a7a6f607dfd2ad9f374d4485916.jpg"
 
-print(f"Testing image analysis with: {test_url}")
-print("-" * 60)
 
-try:
-    result = analyze_single_image(test_url)
-    print("SUCCESS!")
+@pytest.mark.skipif(
+    not os.environ.get("AI_INTEGRATIONS_GEMINI_API_KEY"),
+    reason="AI_INTEGRATIONS_GEMINI_API_KEY not set"
+)
+def test_analyze_single_image():
+    # Imported here: ai_card_generator creates its Gemini client at import time
+    from ai_card_generator import analyze_single_image
+    
+    print(f"Testing image analysis with: {test_url}")
+    print("-" * 60)
+    
+    result = asyncio.run(analyze_single_image(test_url))
     print(f"Result: {result[:200]}...")
-except Exception as e:
-    print(f"FAILED with error: {type(e).__name__}: {e}")
-    import traceback
-    traceback.print_exc()
+    assert result
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v", "-s"]))
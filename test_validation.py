@@ -1,9 +1,12 @@
-"""Test script to verify schema validation is working correctly"""
+"""Schema validation tests (run with pytest, or directly as a script)"""
+import sys
+
+import pytest
+
 from card_schema import validate_card_design
 
-# Test 1: Valid design
-print("Test 1: Valid design...")
-valid_design = {
+# Valid design
+VALID_DESIGN = {
     "card": {
         "width": 148,
         "height": 105,
@@ -29,15 +32,8 @@ valid_design = {
     ]
 }
 
-try:
-    validate_card_design(valid_design)
-    print("✓ Valid design passed validation\n")
-except Exception as e:
-    print(f"✗ Valid design failed: {e}\n")
-
-# Test 2: Invalid font size (too large)
-print("Test 2: Invalid font size (too large)...")
-invalid_font_size = {
+# Invalid font size (too large)
+INVALID_FONT_SIZE = {
     "card": {
         "width": 148,
         "height": 105,
@@ -63,15 +59,8 @@ invalid_font_size = {
     ]
 }
 
-try:
-    validate_card_design(invalid_font_size)
-    print("✗ Invalid font size PASSED validation (SHOULD HAVE FAILED)\n")
-except Exception as e:
-    print(f"✓ Invalid font size correctly rejected: {e}\n")
-
-# Test 3: Invalid font name
-print("Test 3: Invalid font name...")
-invalid_font_name = {
+# Invalid font name
+INVALID_FONT_NAME = {
     "card": {
         "width": 148,
         "height": 105,
@@ -97,15 +86,8 @@ invalid_font_name = {
     ]
 }
 
-try:
-    validate_card_design(invalid_font_name)
-    print("✗ Invalid font name PASSED validation (SHOULD HAVE FAILED)\n")
-except Exception as e:
-    print(f"✓ Invalid font name correctly rejected: {e}\n")
-
-# Test 4: Only 1 text element (should fail, need 2-5)
-print("Test 4: Only 1 text element...")
-too_few_text = {
+# Only 1 text element (should fail, need 2-5)
+TOO_FEW_TEXT = {
     "card": {
         "width": 148,
         "height": 105,
@@ -123,15 +105,8 @@ too_few_text = {
     ]
 }
 
-try:
-    validate_card_design(too_few_text)
-    print("✗ Too few text elements PASSED validation (SHOULD HAVE FAILED)\n")
-except Exception as e:
-    print(f"✓ Too few text elements correctly rejected: {e}\n")
-
-# Test 5: Invalid color format
-print("Test 5: Invalid color format...")
-invalid_color = {
+# Invalid color format
+INVALID_COLOR = {
     "card": {
         "width": 148,
         "height": 105,
@@ -157,10 +132,21 @@ invalid_color = {
     ]
 }
 
-try:
-    validate_card_design(invalid_color)
-    print("✗ Invalid color PASSED validation (SHOULD HAVE FAILED)\n")
-except Exception as e:
-    print(f"✓ Invalid color correctly rejected: {e}\n")
 
-print("Validation tests complete!")
+def test_valid_design():
+    validate_card_design(VALID_DESIGN)
+
+
+@pytest.mark.parametrize("design", [
+    pytest.param(INVALID_FONT_SIZE, id="font_size_too_large"),
+    pytest.param(INVALID_FONT_NAME, id="unknown_font"),
+    pytest.param(TOO_FEW_TEXT, id="too_few_text_elements"),
+    pytest.param(INVALID_COLOR, id="non_hex_color"),
+])
+def test_invalid_design_rejected(design):
+    with pytest.raises(ValueError, match="Card design validation failed"):
+        validate_card_design(design)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))